@@ -0,0 +1,285 @@
+import json
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from config import *
+from changes import slot_key
+from clubs import Club
+from models import Match
+from filter import (BaseMatchFilter, MatchOpenFilter, MatchFutureFilter, MatchMyLevelFilter,
+                    MatchPartnerLevelFilter, MatchTimeWindowFilter, apply_filters)
+from instrument import log, span, count, setup_logging
+
+class MatchIndex:
+    """
+        Open matches of the polled pages, indexed by day, court, duration and
+        minimum level. update() replaces the matches of one (club, day) page
+        slot by slot and only bumps `version` when one of them changed, the
+        cached answers of the previous versions being dropped.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.updated_at: Optional[datetime] = None
+        # (club name, day) -> slot keys of the page
+        self.pages: dict[tuple[str, date], set[tuple]] = {}
+        self.slots: dict[tuple, Match] = {}
+        self.days: list[date] = []
+        self.by_day: dict[date, set[tuple]] = {}
+        self.by_court: dict[str, set[tuple]] = {}
+        self.by_duration: dict[int, set[tuple]] = {}
+        # (min_level, slot key) sorted, level_span being the widest max - min level
+        self.levels: list[tuple[float, tuple]] = []
+        self.level_span = 0.0
+        self.open = MatchOpenFilter()
+
+    def add(self, key: tuple, m: Match):
+        self.slots[key] = m
+        day = m.date.date()
+        if day not in self.by_day:
+            insort(self.days, day)
+        self.by_day.setdefault(day, set()).add(key)
+        self.by_court.setdefault(m.court, set()).add(key)
+        self.by_duration.setdefault(m.duration, set()).add(key)
+        insort(self.levels, (m.min_level, key))
+        self.level_span = max(self.level_span, m.max_level - m.min_level)
+
+    def remove(self, key: tuple):
+        m = self.slots.pop(key)
+        day = m.date.date()
+        self.by_day[day].discard(key)
+        if not self.by_day[day]:
+            del self.by_day[day]
+            self.days.remove(day)
+        self.by_court[m.court].discard(key)
+        self.by_duration[m.duration].discard(key)
+        self.levels.pop(bisect_left(self.levels, (m.min_level, key)))
+
+    def update(self, club: Club, day: date, matches: list[Match]) -> bool:
+        """Replace the matches of a page, return whether the index changed."""
+        current = {slot_key(m): m for m in matches if self.open(m)}
+        with self.lock, span("api.index.update"):
+            previous = self.pages.get((club.name, day), set())
+            changed = False
+            for key in previous - current.keys():
+                self.remove(key)
+                changed = True
+            for key, m in current.items():
+                old = self.slots.get(key)
+                if old == m:
+                    continue
+                if old is not None:
+                    self.remove(key)
+                self.add(key, m)
+                changed = True
+            self.pages[(club.name, day)] = set(current)
+            changed |= self.clear_expired()
+            if changed:
+                self.version += 1
+            self.updated_at = datetime.now()
+        count("api.index.changed" if changed else "api.index.unchanged")
+        return changed
+
+    def clear_expired(self) -> bool:
+        """Drop the pages of the past days, the lock being held."""
+        today = date.today()
+        expired = [page for page in self.pages if page[1] < today]
+        for page in expired:
+            for key in self.pages.pop(page):
+                self.remove(key)
+        return bool(expired)
+
+    def candidates(self, q: "MatchQuery") -> list[Match]:
+        """Matches of the query days, courts, durations and level, unordered."""
+        with self.lock:
+            lo = bisect_left(self.days, q.start)
+            hi = bisect_right(self.days, q.end)
+            keys = set().union(*(self.by_day[d] for d in self.days[lo:hi]))
+            if q.courts:
+                keys &= set().union(*(self.by_court.get(c, set()) for c in q.courts))
+            if q.durations:
+                keys &= set().union(*(self.by_duration.get(d, set()) for d in q.durations))
+            if q.level is not None and keys:
+                lo = bisect_left(self.levels, (q.level - self.level_span,))
+                hi = bisect_right(self.levels, (q.level, (datetime.max,)))
+                keys &= {key for (_, key) in self.levels[lo:hi]}
+            return [self.slots[key] for key in keys]
+
+@dataclass(frozen=True)
+class MatchQuery:
+    """
+        GET /matches parameters, e.g. open 90 minutes slots at my level this week:
+        /matches?duration=90&level=2.1&to=2025-06-08
+        from/to default to today and the last day polled, court and duration
+        can be repeated, time=18:00-21:00 restricts the start time.
+    """
+    start: date
+    end: date
+    courts: tuple[str, ...] = ()
+    durations: tuple[int, ...] = ()
+    level: Optional[float] = None
+    min_partner_level: Optional[float] = None
+    time_windows: tuple[tuple[time, time], ...] = ()
+
+    @staticmethod
+    def from_params(params: dict[str, list[str]]) -> "MatchQuery":
+        def one(name: str) -> Optional[str]:
+            return params[name][-1] if name in params else None
+
+        today = date.today()
+        level = one("level")
+        min_partner_level = one("min_partner_level")
+        return MatchQuery(
+            start=date.fromisoformat(one("from")) if one("from") else today,
+            end=date.fromisoformat(one("to")) if one("to") else today + timedelta(days=DAY_CHECKING_PERIOD),
+            courts=tuple(sorted(params.get("court", ()))),
+            durations=tuple(sorted(int(d) for d in params.get("duration", ()))),
+            level=float(level) if level is not None else None,
+            min_partner_level=float(min_partner_level) if min_partner_level is not None else None,
+            time_windows=tuple(sorted(
+                tuple(time.fromisoformat(t) for t in w.split("-", 1)) for w in params.get("time", ())
+            )),
+        )
+
+    def filters(self) -> list[BaseMatchFilter]:
+        """Checks not answered by the index, same classes as the notifications."""
+        filters: list[BaseMatchFilter] = [MatchFutureFilter()]
+        if self.level is not None:
+            filters.append(MatchMyLevelFilter(my_level=self.level))
+        if self.min_partner_level is not None:
+            # Players whose level is only on their profile are not checked
+            filters.append(MatchPartnerLevelFilter(level=self.min_partner_level))
+        if self.time_windows:
+            filters.append(MatchTimeWindowFilter(list(self.time_windows)))
+        return filters
+
+def match_json(m: Match) -> dict:
+    return {
+        "date": m.date.isoformat(),
+        "location": m.location,
+        "court": m.court,
+        "duration": m.duration,
+        "level": m.level,
+        "min_level": m.min_level,
+        "max_level": m.max_level,
+        "players_needed": m.players_needed,
+        "players": [{"name": p.name, "level": p.level} for p in m.active_players()],
+    }
+
+class ResponseCache:
+    """
+        Encoded answers by query, all dropped when the index version changes.
+        Entries also expire after ttl seconds as matches starting drop out
+        of the answers without any change of the index.
+    """
+    def __init__(self, max_entries: int = API_CACHE_ENTRIES, ttl: float = API_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl)
+        self.lock = threading.Lock()
+        self.version = None
+        self.entries: OrderedDict[MatchQuery, tuple[datetime, bytes]] = OrderedDict()
+
+    def get(self, query: MatchQuery, version: int) -> Optional[bytes]:
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+                return None
+            entry = self.entries.get(query)
+            if entry is None or datetime.now() - entry[0] > self.ttl:
+                return None
+            self.entries.move_to_end(query)
+            return entry[1]
+
+    def set(self, query: MatchQuery, version: int, body: bytes):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[query] = (datetime.now(), body)
+            self.entries.move_to_end(query)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, index: MatchIndex, host: str = API_HOST, port: int = API_PORT):
+        super().__init__((host, port), ApiHandler)
+        self.index = index
+        self.responses = ResponseCache()
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        log.info("Query API listening on http://%s:%d", *self.server_address[:2])
+        return thread
+
+    def matches(self, query: MatchQuery) -> bytes:
+        version = self.index.version
+        body = self.responses.get(query, version)
+        if body is not None:
+            count("api.cache.hit")
+            return body
+        count("api.cache.miss")
+        matches = apply_filters(self.index.candidates(query), query.filters())
+        matches.sort(key=lambda m: (m.date, m.court))
+        body = json.dumps({"version": version, "matches": [match_json(m) for m in matches]}).encode("utf-8")
+        self.responses.set(query, version, body)
+        return body
+
+    def status(self) -> bytes:
+        index = self.index
+        with index.lock:
+            status = {
+                "version": index.version,
+                "updated_at": index.updated_at.isoformat() if index.updated_at else None,
+                "matches": len(index.slots),
+                "days": [d.isoformat() for d in index.days],
+            }
+        return json.dumps(status).encode("utf-8")
+
+class ApiHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server: ApiServer = self.server
+        url = urlparse(self.path)
+        with span("api.request"):
+            try:
+                if url.path == "/matches":
+                    body = server.matches(MatchQuery.from_params(parse_qs(url.query)))
+                elif url.path == "/status":
+                    body = server.status()
+                else:
+                    self.send_error(404)
+                    return
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("api: " + format, *args)
+
+if __name__ == "__main__":
+    # The index is fed by the watcher polls, queries never trigger a scrape
+    from watch import Watcher
+
+    setup_logging()
+    index = MatchIndex()
+    server = ApiServer(index)
+    server.start()
+    try:
+        Watcher(index=index).run()
+    finally:
+        server.shutdown()
@@ -0,0 +1,204 @@
+import csv
+import json
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from config import *
+from models import Match
+from instrument import span, count
+
+STATUSES = ("raw", "filtered", "notified")
+
+class MatchArchive:
+    """
+    Append-only history of the observed matches.
+
+        snapshots(match_day, court, start, scraped_at, status, ...)
+            WITHOUT ROWID table clustered on its primary key, so the rows of
+            a match day are stored together (one partition per day) and a
+            range of days is a range scan. A snapshot is only appended when
+            the slot looks different from its last snapshot of that status.
+        player_levels(level, name, match_day, scraped_at)
+            levels of the players seen in the raw snapshots, clustered by level.
+
+    Secondary indexes cover the court and duration queries.
+    """
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self.dirty = False
+        # Snapshots are recorded from the notification threads too
+        self.lock = threading.Lock()
+        # (match_day, court, start, status) -> signature of the last snapshot
+        self.last: dict[tuple, tuple] = {}
+        self.loaded_days: set[str] = set()
+        # Autocommit, record() writes in short explicit transactions so the
+        # write lock is never held across a run by one of several processes
+        self.db = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT,
+                                  isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                match_day TEXT NOT NULL,
+                court TEXT NOT NULL,
+                start TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                duration INTEGER,
+                min_level REAL,
+                max_level REAL,
+                players_needed INTEGER,
+                hash INTEGER,
+                players TEXT,
+                PRIMARY KEY (match_day, court, start, status, scraped_at)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS snapshots_court ON snapshots (court, start);
+            CREATE INDEX IF NOT EXISTS snapshots_duration ON snapshots (duration, status, start);
+            CREATE TABLE IF NOT EXISTS player_levels (
+                level REAL NOT NULL,
+                name TEXT NOT NULL,
+                match_day TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                PRIMARY KEY (level, name, match_day, scraped_at)
+            ) WITHOUT ROWID;
+        """)
+
+    @staticmethod
+    def signature(match: Match) -> tuple:
+        return (match.stable_hash(), match.players_needed, match.min_level, match.max_level)
+
+    def load_day(self, match_day: str):
+        """Last snapshot signature of every slot of the day, read once."""
+        if match_day in self.loaded_days:
+            return
+        rows = self.db.execute(
+            """SELECT court, start, status, hash, players_needed, min_level, max_level FROM snapshots
+               WHERE match_day = ? ORDER BY scraped_at""", (match_day,))
+        for court, start, status, sha, needed, min_level, max_level in rows:
+            self.last[(match_day, court, start, status)] = (sha + (1 << 64) if sha < 0 else sha, needed, min_level, max_level)
+        self.loaded_days.add(match_day)
+
+    def record(self, matches: Iterable[Match], status: str, scraped_at: Optional[datetime] = None):
+        """Append a snapshot of the matches that changed since their last one."""
+        assert status in STATUSES
+        scraped_at = (scraped_at or datetime.now()).isoformat(timespec="seconds")
+        rows, levels = [], []
+        with self.lock, span("archive.record"):
+            for m in matches:
+                match_day = m.date.date().isoformat()
+                start = m.date.isoformat()
+                self.load_day(match_day)
+                key = (match_day, m.court, start, status)
+                sig = self.signature(m)
+                if self.last.get(key) == sig:
+                    continue
+                self.last[key] = sig
+                sha = m.stable_hash()
+                rows.append((match_day, m.court, start, scraped_at, status, m.duration, m.min_level, m.max_level,
+                             m.players_needed, sha - (1 << 64) if sha >= (1 << 63) else sha,
+                             json.dumps([p.name for p in m.active_players()])))
+                if status == "raw":
+                    levels.extend((p.level, p.name, match_day, scraped_at)
+                                  for p in m.active_players() if getattr(p, "level", None))
+            if rows:
+                self.db.execute("BEGIN")
+                try:
+                    self.db.executemany("INSERT OR IGNORE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    self.db.executemany("INSERT OR IGNORE INTO player_levels VALUES (?, ?, ?, ?)", levels)
+                    self.db.execute("COMMIT")
+                except BaseException:
+                    self.db.execute("ROLLBACK")
+                    raise
+                self.dirty = True
+        count(f"archive.{status}", len(rows))
+
+    def save(self):
+        # Every batch is committed already, fold the WAL back into the .db file
+        with self.lock, span("archive.save"):
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.save()
+        self.db.close()
+
+    # Queries
+
+    def slots(self, court: str, start: date, end: date, status: str = "raw") -> list[dict]:
+        """Latest snapshot of every slot of the court between the two days (included)."""
+        rows = self.db.execute(
+            """SELECT start, duration, players_needed, min_level, max_level, players, MAX(scraped_at)
+               FROM snapshots
+               WHERE court = ? AND start >= ? AND start < ? AND status = ?
+               GROUP BY start ORDER BY start""",
+            (court, start.isoformat(), date.fromordinal(end.toordinal() + 1).isoformat(), status))
+        return [
+            {"start": s, "duration": d, "players_needed": n, "min_level": lo, "max_level": hi,
+             "players": json.loads(p), "scraped_at": at}
+            for (s, d, n, lo, hi, p, at) in rows
+        ]
+
+    def fill_times(self, duration: int) -> list[dict]:
+        """
+            For the slots of this duration seen open then full: when they were
+            first seen open, when they were first seen full and how long it took.
+        """
+        rows = self.db.execute(
+            """SELECT start, court,
+                      MIN(CASE WHEN players_needed > 0 THEN scraped_at END) AS opened,
+                      MIN(CASE WHEN players_needed = 0 THEN scraped_at END) AS filled
+               FROM snapshots
+               WHERE duration = ? AND status = 'raw'
+               GROUP BY start, court
+               HAVING opened IS NOT NULL AND filled > opened
+               ORDER BY start""", (duration,))
+        return [
+            {"start": s, "court": c, "opened": o, "filled": f,
+             "hours": (datetime.fromisoformat(f) - datetime.fromisoformat(o)).total_seconds() / 3600}
+            for (s, c, o, f) in rows
+        ]
+
+    def players_at_level(self, level: float, margin: float = 0.25) -> list[dict]:
+        """Players seen with a level within margin of this one, most frequent first."""
+        rows = self.db.execute(
+            """SELECT name, AVG(level), COUNT(DISTINCT match_day), MAX(match_day)
+               FROM player_levels WHERE level BETWEEN ? AND ?
+               GROUP BY name ORDER BY COUNT(DISTINCT match_day) DESC""",
+            (level - margin, level + margin))
+        return [{"name": n, "level": lvl, "days": d, "last_day": last} for (n, lvl, d, last) in rows]
+
+    def export(self, status: str, out) -> int:
+        """Write all the snapshots of a status as CSV, return the row count."""
+        writer = csv.writer(out)
+        writer.writerow(("scraped_at", "start", "court", "duration", "players_needed", "min_level", "max_level", "players"))
+        n = 0
+        for row in self.db.execute(
+                """SELECT scraped_at, start, court, duration, players_needed, min_level, max_level, players
+                   FROM snapshots WHERE status = ? ORDER BY match_day, court, start, scraped_at""", (status,)):
+            writer.writerow(row)
+            n += 1
+        return n
+
+if __name__ == "__main__":
+    """
+        python archive.py slots "Terrain 2" 2025-06-01 2025-06-30
+        python archive.py fill-times 90
+        python archive.py players 2.1
+        python archive.py export notified > notified.csv
+    """
+    archive = MatchArchive()
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "slots":
+        result = archive.slots(args[0], date.fromisoformat(args[1]), date.fromisoformat(args[2]))
+    elif command == "fill-times":
+        result = archive.fill_times(int(args[0]))
+    elif command == "players":
+        result = archive.players_at_level(float(args[0]))
+    elif command == "export":
+        archive.export(args[0], sys.stdout)
+        sys.exit(0)
+    else:
+        sys.exit(f"Unknown command {command}")
+    print(json.dumps(result, indent=2))
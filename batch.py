@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Callable, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    # Only needed for batch analytics, the hourly run does not use it
+    np = None
+
+from models import Match
+from filter import (BaseMatchFilter, MatchOpenFilter, MatchFutureFilter, MatchDurationFilter,
+                    MatchMyLevelFilter, MatchPartnerLevelFilter)
+
+class MatchBatch:
+    """
+        Columnar copy of a list of matches, one array per field:
+        date, court (number in its club, 0 if unknown), duration, min/max level,
+        players needed and the level of the 4 slots (NaN for empty slots and
+        unknown levels). Filters produce boolean masks over the whole batch
+        and only the surviving rows are turned back into Match objects.
+    """
+    def __init__(self, matches: Iterable[Match]):
+        if np is None:
+            raise ImportError("MatchBatch needs numpy (pip install numpy)")
+        self.matches = list(matches)
+        self.date = np.array([m.date for m in self.matches], dtype="datetime64[us]")
+        self.court = np.array([int(getattr(m, "court_e", 0)) for m in self.matches], dtype=np.int8)
+        self.duration = np.array([m.duration for m in self.matches], dtype=np.int16)
+        self.min_level = np.array([m.min_level for m in self.matches], dtype=np.float64)
+        self.max_level = np.array([m.max_level for m in self.matches], dtype=np.float64)
+        self.players_needed = np.array([m.players_needed for m in self.matches], dtype=np.int8)
+        self.player_level = np.array(
+            [[slot_level(p) for p in m.a_team + m.b_team] for m in self.matches],
+            dtype=np.float64,
+        ).reshape(len(self.matches), 4)
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def select(self, mask) -> list[Match]:
+        return [self.matches[i] for i in np.flatnonzero(mask)]
+
+def slot_level(player) -> float:
+    # Same truthiness as MatchPartnerLevelFilter: empty, unknown or 0 levels are ignored
+    if player.is_empty() or not getattr(player, "level", None):
+        return np.nan
+    return player.level
+
+def open_mask(f: MatchOpenFilter, batch: MatchBatch):
+    return (batch.players_needed > 0) & (batch.players_needed < 4)
+
+def future_mask(f: MatchFutureFilter, batch: MatchBatch):
+    return batch.date >= np.datetime64(datetime.now(), "us")
+
+def duration_mask(f: MatchDurationFilter, batch: MatchBatch):
+    return batch.duration == f.duration
+
+def my_level_mask(f: MatchMyLevelFilter, batch: MatchBatch):
+    return (batch.min_level <= f.my_level) & (f.my_level <= batch.max_level)
+
+def partner_level_mask(f: MatchPartnerLevelFilter, batch: MatchBatch):
+    # NaN compares False, so empty slots never reject
+    return ~np.any(batch.player_level <= f.min_level, axis=1)
+
+VECTORIZED: dict[type, Callable] = {
+    MatchOpenFilter: open_mask,
+    MatchFutureFilter: future_mask,
+    MatchDurationFilter: duration_mask,
+    MatchMyLevelFilter: my_level_mask,
+    MatchPartnerLevelFilter: partner_level_mask,
+}
+
+def filter_batch(batch: MatchBatch, filters: list[BaseMatchFilter]) -> list[Match]:
+    """
+        Same result as [m for m in batch.matches if all(f(m) for f in filters)].
+        Filters without a vectorized version run per match on the survivors.
+        Player profiles must have been fetched before for MatchPartnerLevelFilter.
+    """
+    mask = np.ones(len(batch), dtype=bool)
+    others = []
+    for f in filters:
+        vectorized = VECTORIZED.get(type(f))
+        if vectorized:
+            mask &= vectorized(f, batch)
+        else:
+            others.append(f)
+    return [m for m in batch.select(mask) if all(f(m) for f in others)]
@@ -0,0 +1,57 @@
+import json
+import os
+from datetime import date
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class Fixtures:
+    """
+    Recorded pages of the club site:
+
+        <path>/grid/<offset>.html      Grid.aspx of today + offset days
+        <path>/profile/<id>.html       Perfil.aspx of a player
+        <path>/manifest.json           {"recorded_on": "YYYY-MM-DD", "grids": [...], "profiles": [...]}
+
+    Grid pages are stored by day offset so they can be replayed any day.
+    """
+    def __init__(self, path=FIXTURES_DIR):
+        self.path = path
+
+    def grid_path(self, offset: int) -> str:
+        return os.path.join(self.path, "grid", f"{offset}.html")
+
+    def profile_path(self, player_id: str) -> str:
+        return os.path.join(self.path, "profile", f"{player_id}.html")
+
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def save_grid(self, offset: int, html: str):
+        self.write(self.grid_path(offset), html)
+
+    def save_profile(self, player_id: str, html: str):
+        self.write(self.profile_path(player_id), html)
+
+    def save_manifest(self, grids: list[int], profiles: list[str]):
+        manifest = {"recorded_on": date.today().isoformat(), "grids": sorted(grids), "profiles": sorted(profiles)}
+        self.write(self.manifest_path(), json.dumps(manifest, indent=2))
+
+    def manifest(self) -> dict:
+        with open(self.manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def read(self, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def grid(self, offset: int) -> str:
+        return self.read(self.grid_path(offset))
+
+    def profile(self, player_id: str) -> str:
+        return self.read(self.profile_path(player_id))
+
+    @staticmethod
+    def write(path: str, text: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
@@ -0,0 +1,47 @@
+"""
+Record the grid pages of the checked days and the profiles of their
+players from the live club site:
+
+    python -m bench.record [--profiles]
+"""
+import argparse
+from datetime import date, timedelta
+from urllib.parse import urljoin
+
+from bench.fixtures import Fixtures
+from config import *
+import http_client
+from player_cache import player_key
+from scraper import grid_url, parse_grid_page
+
+def record(fixtures: Fixtures, with_profiles: bool):
+    today = date.today()
+    grids = []
+    links = set()
+    for offset in range(DAY_CHECKING_PERIOD):
+        day = today + timedelta(days=offset)
+        response = http_client.get(grid_url(day))
+        response.raise_for_status()
+        fixtures.save_grid(offset, response.text)
+        grids.append(offset)
+        for match in parse_grid_page(response.text, day):
+            links.update(p.link for p in match.active_players())
+        print(f"{day}: recorded")
+
+    profiles = []
+    if with_profiles:
+        for link in sorted(links):
+            response = http_client.get(urljoin(urban_link_prefix, link))
+            response.raise_for_status()
+            fixtures.save_profile(player_key(link), response.text)
+            profiles.append(player_key(link))
+        print(f"{len(profiles)} profiles recorded")
+
+    fixtures.save_manifest(grids, profiles)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", action="store_true", help="also record the player profiles")
+    parser.add_argument("--path", default=Fixtures().path)
+    args = parser.parse_args()
+    record(Fixtures(args.path), args.profiles)
@@ -0,0 +1,81 @@
+"""
+Local stand-in for the club site serving recorded fixtures:
+
+    python -m bench.replay [--port 8765] [--latency 0.2]
+
+then run the app against it with PADEL_URL=http://127.0.0.1:8765
+"""
+import argparse
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from bench.fixtures import Fixtures
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures: Fixtures, latency: float = 0.0, port: int = 0):
+        super().__init__(("127.0.0.1", port), ReplayHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def page(self, path: str, query: dict) -> str:
+        """Return the fixture for this request or None."""
+        if path.endswith("Grid.aspx"):
+            day = datetime.strptime(query["f"][0], "%d/%m/%Y").date()
+            return self.fixtures.grid((day - date.today()).days)
+        elif path.endswith("Perfil.aspx"):
+            return self.fixtures.profile(query["id"][0])
+        return None
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server: ReplayServer = self.server
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlparse(self.path)
+        try:
+            body = server.page(url.path, parse_qs(url.query))
+        except (FileNotFoundError, KeyError, ValueError):
+            body = None
+
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--path", default=Fixtures().path)
+    args = parser.parse_args()
+    server = ReplayServer(Fixtures(args.path), args.latency, args.port)
+    print(f"Serving {args.path} on {server.url}")
+    server.serve_forever()
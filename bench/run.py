@@ -0,0 +1,162 @@
+"""
+Offline benchmarks on the recorded fixtures (see bench/record.py):
+
+    python -m bench.run [--latency 0.1] [--workers 1 4 8] [--repeat 5] [--json out.json]
+
+Reports the fetch time of a full scrape against the local replay server,
+the parse time per match, the time of every filter and the MatchCache time.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bench.fixtures import Fixtures
+from bench.replay import ReplayServer
+
+def best_of(fn, repeat: int) -> float:
+    """Best wall time of repeat calls of fn, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def fresh_state(workdir: str):
+    """Point every on disk cache to an empty directory so nothing is reused."""
+    import http_cache
+    from scraper import ScrapePlayer, block_tracker
+
+    os.chdir(tempfile.mkdtemp(dir=workdir))
+    # Both are loaded again from the new directory on first use
+    http_cache._cache = None
+    ScrapePlayer.player_cache = None
+    # Loaded at import, shared by reference: emptied rather than replaced
+    block_tracker.reset()
+
+def bench_parse(fixtures: Fixtures, repeat: int) -> tuple[dict, list]:
+    from scraper import HTML_PARSER, parse_grid_page
+
+    today = date.today()
+    pages = [(today + timedelta(days=o), fixtures.grid(o)) for o in fixtures.manifest()["grids"]]
+    matches = []
+    for day, html in pages:
+        matches.extend(parse_grid_page(html, day))
+
+    seconds = best_of(lambda: [parse_grid_page(html, day) for day, html in pages], repeat)
+    return {
+        "parser": HTML_PARSER,
+        "pages": len(pages),
+        "matches": len(matches),
+        "seconds": seconds,
+        "ms_per_match": seconds / len(matches) * 1000 if matches else 0.0,
+    }, matches
+
+def bench_filters(matches: list, repeat: int) -> dict:
+    from filter import filters
+
+    results = {}
+    for f in filters:
+        seconds = best_of(lambda: [f(m) for m in matches], repeat)
+        results[type(f).__name__] = {
+            "seconds": seconds,
+            "us_per_match": seconds / len(matches) * 1e6 if matches else 0.0,
+            "kept": sum(1 for m in matches if f(m)),
+        }
+    seconds = best_of(lambda: [m for m in matches if all(f(m) for f in filters)], repeat)
+    results["chain"] = {"seconds": seconds}
+    return results
+
+def bench_cache(matches: list, workdir: str) -> dict:
+    from cache import MatchCache
+
+    cache = MatchCache(os.path.join(tempfile.mkdtemp(dir=workdir), "seen_matches.db"))
+    unique = list({m.stable_hash(): m for m in matches}.values())
+
+    start = time.perf_counter()
+    for m in unique:
+        cache.claim(m)
+        cache.confirm(m)
+    cache.save()
+    add_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for m in unique:
+        cache.has_seen(m)
+    lookup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cache.clear_expired()
+    cache.save()
+    expire_seconds = time.perf_counter() - start
+    cache.close()
+
+    return {
+        "entries": len(unique),
+        "add_seconds": add_seconds,
+        "has_seen_seconds": lookup_seconds,
+        "clear_expired_seconds": expire_seconds,
+    }
+
+def bench_end_to_end(server: ReplayServer, workers: list[int], workdir: str) -> dict:
+    from filter import filters, filter_matches
+    from scraper import get_matches2
+
+    results = {}
+    for w in workers:
+        fresh_state(workdir)
+        server.requests = 0
+        start = time.perf_counter()
+        matches = get_matches2(max_workers=w)
+        scrape_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        kept = filter_matches(matches, filters)
+        filter_seconds = time.perf_counter() - start
+        results[f"workers={w}"] = {
+            "scrape_seconds": scrape_seconds,
+            "filter_and_enrich_seconds": filter_seconds,
+            "requests": server.requests,
+            "matches": len(matches),
+            "kept": len(kept),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=Fixtures().path, help="fixtures directory")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every replayed answer")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    fixtures = Fixtures(os.path.abspath(args.path))
+    server = ReplayServer(fixtures, latency=args.latency)
+    server.start()
+    # Must be set before the app modules read config.py
+    os.environ["PADEL_URL"] = server.url
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        try:
+            parse, matches = bench_parse(fixtures, args.repeat)
+            results = {
+                "parse": parse,
+                "filters": bench_filters(matches, args.repeat),
+                "cache": bench_cache(matches, workdir),
+                "end_to_end": bench_end_to_end(server, args.workers, workdir),
+            }
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Scaling report on synthetic pages (see bench/synth.py): time and peak
+memory of the parse, filter and cache stages against the input size.
+
+    python -m bench.scale [--scales 1 2 5 10] [--days 13] [--courts 4] [--json out.json]
+
+Scale n multiplies the courts of every grid page by n, so n=10 is a club
+ten times bigger or ten clubs scraped together. Each stage is run once
+for its time and once more under tracemalloc for its peak memory, the
+tracing slowing it down.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from bench.synth import GridSynth, SynthConfig
+
+def measure(fn) -> dict:
+    """Wall time of fn, then its peak traced memory on a second call."""
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / 1024 / 1024, "result": result}
+
+def run_scale(synth: GridSynth, workdir: str) -> dict:
+    from cache import MatchCache
+    from filter import filters, FilterPipeline
+    from player_cache import player_key
+    from scraper import ScrapePlayer, parse_grid_page
+
+    club = synth.club("http://synth.invalid")
+    today = date.today()
+    pages = [(today + timedelta(days=o), synth.grid(o)) for o in range(synth.config.days)]
+    levels = {p.id: (p.level, p.note) for p in synth.players}
+
+    def parse():
+        return [m for day, html in pages for m in parse_grid_page(html, day, club)]
+
+    parsed = measure(parse)
+    matches = parsed.pop("result")
+
+    # Stand-in for enrich_players, the profiles are known
+    player_cache = ScrapePlayer.cache()
+    for m in matches:
+        for p in m.active_players():
+            if p.level is None:
+                player_cache.set(p.link, *levels[player_key(p.link)])
+
+    def filter_chain():
+        return FilterPipeline(filters, reorder=False).run(matches, filters)
+
+    filtered = measure(filter_chain)
+    kept = filtered.pop("result")
+
+    unique = list({m.stable_hash(): m for m in matches}.values())
+
+    def cache_round():
+        cache = MatchCache(os.path.join(tempfile.mkdtemp(dir=workdir), "seen_matches.db"))
+        for m in unique:
+            cache.claim(m)
+            cache.confirm(m)
+        seen = sum(1 for m in unique if cache.has_seen(m))
+        cache.clear_expired()
+        cache.save()
+        cache.close()
+        return seen
+
+    cached = measure(cache_round)
+    cached.pop("result")
+
+    return {
+        "pages": len(pages),
+        "bytes": sum(len(html) for _, html in pages),
+        "matches": len(matches),
+        "kept": len(kept),
+        "parse": parsed,
+        "filters": filtered,
+        "cache": cached,
+    }
+
+def print_report(results: dict):
+    print(f"{'scale':>6} {'stage':<8} {'matches':>8} {'seconds':>9} {'us/match':>9} {'peak MB':>8}")
+    for scale, r in results.items():
+        for stage in ("parse", "filters", "cache"):
+            s = r[stage]
+            per_match = s["seconds"] / r["matches"] * 1e6 if r["matches"] else 0.0
+            print(f"{scale:>6} {stage:<8} {r['matches']:>8} {s['seconds']:>9.3f} {per_match:>9.1f} {s['peak_mb']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--days", type=int, default=SynthConfig.days)
+    parser.add_argument("--courts", type=int, default=SynthConfig.courts)
+    parser.add_argument("--seed", type=int, default=SynthConfig.seed)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        # The app caches are loaded from the working directory
+        os.chdir(workdir)
+        try:
+            for scale in args.scales:
+                config = SynthConfig(days=args.days, courts=args.courts * scale,
+                                     players=300 * scale, seed=args.seed)
+                results[scale] = run_scale(GridSynth(config), workdir)
+        finally:
+            os.chdir(cwd)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Generate matchpoint-like Grid.aspx and Perfil.aspx pages at any scale,
+written as fixtures (see bench/fixtures.py) so they can be replayed:
+
+    python -m bench.synth --path /tmp/synth [--days 13] [--courts 4] [--players 300] [--seed 0]
+    python -m bench.run --path /tmp/synth
+
+Courts past "Terrain 4" are only known to the club returned by
+GridSynth.club(), the Urban club skips them.
+"""
+import argparse
+import random
+from dataclasses import dataclass
+from html import escape
+
+from bench.fixtures import Fixtures
+
+FIRST_NAMES = ("Jérôme", "Anna", "Marc", "Zoé", "Luca", "Inès", "Noah", "Léa", "Bob", "Carla", "Müller", "Sofia")
+LAST_NAMES = ("Dupont", "Keller", "Rossi", "Meier", "Favre", "Da Silva", "Nguyen", "Berger", "Schmid", "Perrin")
+POSITIONS = ("Droite", "Revers")
+
+@dataclass
+class SynthConfig:
+    days: int = 13
+    courts: int = 4
+    first_hour: int = 8
+    last_hour: int = 22
+    players: int = 300
+    free_rate: float = 0.3          # chance of every spot being "Libre"
+    all_levels_rate: float = 0.05   # "Tous les niveaux" instead of "Niveaux: a - b"
+    three_players_rate: float = 0.02  # 3 players in one team, discarded by the parser
+    grid_level_rate: float = 0.5    # players whose level is printed on the grid
+    seed: int = 0
+
+@dataclass(frozen=True)
+class SynthPlayer:
+    id: str
+    name: str
+    level: float
+    note: float
+
+def level_str(level: float) -> str:
+    return f"{level:.2f}".replace(".", ",")
+
+class GridSynth:
+    """
+        Deterministic for a given config: the same seed always gives the
+        same pages. Odd courts host 60 minutes matches, even ones 90
+        minutes like the Urban club.
+    """
+    def __init__(self, config: SynthConfig = SynthConfig()):
+        self.config = config
+        rng = random.Random(config.seed)
+        self.players = [
+            SynthPlayer(
+                id=f"{rng.getrandbits(128):032x}",
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+                level=round(rng.uniform(0.3, 4.5), 2),
+                note=round(rng.uniform(0, 30), 1),
+            )
+            for i in range(config.players)
+        ]
+
+    @staticmethod
+    def duration(court: int) -> int:
+        return 90 if court % 2 == 0 else 60
+
+    def club(self, base_url: str):
+        """Club knowing every synthetic court."""
+        from clubs import Club, Court
+        courts = tuple(Court(f"Terrain {n}", n, self.duration(n)) for n in range(1, self.config.courts + 1))
+        return Club(name="synth", base_url=base_url, location="Synth", courts=courts)
+
+    def slots(self) -> list[tuple[int, str]]:
+        slots = []
+        for court in range(1, self.config.courts + 1):
+            minutes = self.config.first_hour * 60
+            while minutes + self.duration(court) <= self.config.last_hour * 60:
+                slots.append((court, f"{minutes // 60:02d}:{minutes % 60:02d}"))
+                minutes += self.duration(court)
+        return slots
+
+    def player_html(self, prefix: str, slot: str, player: SynthPlayer, rng: random.Random) -> str:
+        ids = f"{prefix}_{slot}_WUCParticipantePartidaCuadro"
+        if player is None:
+            return (f'<a id="{ids}_HyperLinkJugador" href="#">'
+                    f'<span id="{ids}_LabelTexto">Libre</span></a>')
+        text = escape(player.name)
+        if rng.random() < self.config.grid_level_rate:
+            text = f"{level_str(player.level)}-{text}"
+        if rng.random() < 0.5:
+            text += f" ({rng.choice(POSITIONS)})"
+        return (f'<a id="{ids}_HyperLinkJugador" href="../Perfil.aspx?id={player.id}&amp;return_url=Grid.aspx">'
+                f'<span id="{ids}_LabelTexto">{text}</span></a>')
+
+    def match_html(self, index: int, court: int, start: str, rng: random.Random) -> str:
+        prefix = f"ctl01_DataListPartidas_ctl{index:02d}"
+        if rng.random() < self.config.all_levels_rate:
+            levels = "Tous les niveaux"
+        else:
+            low = round(rng.uniform(0.3, 4.0), 2)
+            levels = f"Niveaux: {level_str(low)} - {level_str(low + rng.choice((0.5, 1.0, 1.5)))}"
+
+        if rng.random() < self.config.three_players_rate:
+            teams = {"EquipoA": 3, "EquipoB": 1}
+        else:
+            teams = {"EquipoA": 2, "EquipoB": 2}
+        free = rng.random() < self.config.free_rate
+        players = []
+        for team, size in teams.items():
+            for n in range(size):
+                player = None if free and rng.random() < 0.6 else rng.choice(self.players)
+                players.append(self.player_html(f"{prefix}_{team}", f"ctl{n:02d}", player, rng))
+
+        return (
+            f'<div class="gridviewestilocabecera">'
+            f'<a id="{prefix}_WUCElementoPartidaCuadro_HyperLinkHorario" href="Partida.aspx?id={index}">'
+            f'Terrain {court} {start}</a></div>\n'
+            f'<div class="contenedorPartida">'
+            f'<span id="{prefix}_WUCElementoPartidaCuadro_LabelDescripcionNiveles">{levels}</span>\n'
+            f'<span id="{prefix}_WUCElementoPartidaCuadro_LabelEstado">{"Ouvert" if free else "Complet"}</span>\n'
+            + "\n".join(players) +
+            '\n</div>\n'
+        )
+
+    def grid(self, offset: int) -> str:
+        rng = random.Random(f"{self.config.seed}/{offset}")
+        blocks = [self.match_html(i, court, start, rng) for i, (court, start) in enumerate(self.slots())]
+        return ('<html><head><title>Grid</title></head><body><form id="aspnetForm">\n'
+                '<div id="ctl01_DataListPartidas">\n' + "".join(blocks) + '</div>\n</form></body></html>')
+
+    def profile(self, player: SynthPlayer) -> str:
+        return ('<html><body><div class="perfil">'
+                f'<span id="ctl01_ctl00_WUCRegistroNivelJuego_LabelValorNivel">{level_str(player.level)}</span>'
+                f'<span id="ctl01_WUCPuntuacion_LabelValorPuntuacionRanking">{level_str(player.note)}</span>'
+                '</div></body></html>')
+
+    def write(self, fixtures: Fixtures):
+        grids = list(range(self.config.days))
+        for offset in grids:
+            fixtures.save_grid(offset, self.grid(offset))
+        for player in self.players:
+            fixtures.save_profile(player.id, self.profile(player))
+        fixtures.save_manifest(grids, [p.id for p in self.players])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", required=True, help="fixtures directory to write")
+    parser.add_argument("--days", type=int, default=SynthConfig.days)
+    parser.add_argument("--courts", type=int, default=SynthConfig.courts)
+    parser.add_argument("--players", type=int, default=SynthConfig.players)
+    parser.add_argument("--seed", type=int, default=SynthConfig.seed)
+    args = parser.parse_args()
+    synth = GridSynth(SynthConfig(days=args.days, courts=args.courts, players=args.players, seed=args.seed))
+    synth.write(Fixtures(args.path))
+    print(f"{args.days} grids of {len(synth.slots())} matches and {args.players} profiles written to {args.path}")
@@ -1,47 +1,146 @@
+import os
 import pickle
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 from typing import Set
 
+from config import *
+from instrument import log, span, count
+
 class MatchCache:
     """
-    cache = {
-        match_hash1: match_date1,
-        match_hash2: match_date2,
-        ...
-    }
+    SQLite table of the notified matches, indexed by match date:
+
+        seen(hash INTEGER PRIMARY KEY, date TEXT, state TEXT, claimed_at TEXT)
+
+    Lookups hit the primary key index without loading the table, new
+    matches are claimed one by one and expiry is a range delete on the
+    date index. `dirty` tells whether anything changed since the load.
+
+    Several processes can share the database: every statement commits on
+    its own and a match is claimed (state "claimed") before being sent,
+    the claim being atomic, so only one of them notifies it. The claim is
+    confirmed (state "notified") once delivered or released on failure.
     """
-    def __init__(self, path="seen_matches.pkl"):
+    def __init__(self, path="seen_matches.db", claim_timeout=timedelta(seconds=MATCH_CLAIM_TIMEOUT)):
         self.path = path
+        self.claim_timeout = claim_timeout
+        self.dirty = False
+        # Matches are added from the notification threads
+        self.lock = threading.Lock()
+        with span("cache.match.load"):
+            # Autocommit, claims are seen by the other processes right away
+            self.db = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT,
+                                      isolation_level=None, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS seen (
+                hash INTEGER PRIMARY KEY, date TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'notified', claimed_at TEXT)""")
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(seen)")}
+            if "state" not in columns:
+                # Written by the versions without claims
+                self.db.execute("ALTER TABLE seen ADD COLUMN state TEXT NOT NULL DEFAULT 'notified'")
+                self.db.execute("ALTER TABLE seen ADD COLUMN claimed_at TEXT")
+            self.db.execute("CREATE INDEX IF NOT EXISTS seen_date ON seen (date)")
+            self.import_pickle()
+
+    @staticmethod
+    def db_hash(sha: int) -> int:
+        # stable_hash is an unsigned 64 bit int, SQLite integers are signed
+        return sha - (1 << 64) if sha >= (1 << 63) else sha
+
+    def import_pickle(self, path="seen_matches.pkl"):
+        """
+            Import the still relevant entries of the pickled cache of the previous
+            versions, once: the pickle is renamed to path.imported afterwards.
+        """
         try:
-            with open(self.path, "rb") as f:
-                self.seen: dict[int] = pickle.load(f)
+            with open(path, "rb") as f:
+                seen: dict[int, datetime] = pickle.load(f)
         except FileNotFoundError:
-            self.seen = dict()
-        print(self.seen)
+            return
+        now = datetime.now()
+        with self.lock:
+            before = self.db.total_changes
+            # One transaction rather than one per entry
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT OR IGNORE INTO seen (hash, date) VALUES (?, ?)",
+                [(self.db_hash(sha), d.isoformat()) for sha, d in seen.items() if d >= now],
+            )
+            self.db.execute("COMMIT")
+            if self.db.total_changes != before:
+                self.dirty = True
+        os.replace(path, path + ".imported")
+        log.info("Imported %d matches of %s", len(seen), path)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
 
     def has_seen(self, match) -> bool:
-        print(match.stable_hash())
-        return match.stable_hash() in self.seen
+        with self.lock, span("cache.match.has_seen"):
+            row = self.db.execute("SELECT 1 FROM seen WHERE hash = ?", (self.db_hash(match.stable_hash()),)).fetchone()
+        return row is not None
+
+    def claim(self, match) -> bool:
+        """
+            Atomically reserve the notification of the match, False if it was
+            already notified or claimed by a live process (this one included).
+        """
+        sha = self.db_hash(match.stable_hash())
+        now = datetime.now()
+        with self.lock, span("cache.match.claim"):
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO seen (hash, date, state, claimed_at) VALUES (?, ?, 'claimed', ?)",
+                (sha, match.date.isoformat(), now.isoformat()))
+            if not cursor.rowcount:
+                # Left behind by a process that died before sending
+                cursor = self.db.execute(
+                    "UPDATE seen SET claimed_at = ? WHERE hash = ? AND state = 'claimed' AND claimed_at < ?",
+                    (now.isoformat(), sha, (now - self.claim_timeout).isoformat()))
+                if cursor.rowcount:
+                    count("cache.match.claim_taken_over")
+            claimed = cursor.rowcount == 1
+            if claimed:
+                self.dirty = True
+        count("cache.match.claimed" if claimed else "cache.match.claim_refused")
+        return claimed
+
+    def confirm(self, match):
+        """The claimed match was notified."""
+        with self.lock:
+            self.db.execute("UPDATE seen SET state = 'notified', claimed_at = NULL WHERE hash = ?",
+                            (self.db_hash(match.stable_hash()),))
+            self.dirty = True
 
-    def add(self, match):
-        sha = match.stable_hash()
-        if sha in self.seen:
-            assert 0
-        else:
-            self.seen[sha] = match.date
+    def release(self, match):
+        """The notification failed, let the next run claim it again."""
+        with self.lock:
+            self.db.execute("DELETE FROM seen WHERE hash = ? AND state = 'claimed'",
+                            (self.db_hash(match.stable_hash()),))
 
     def save(self):
-        with open(self.path, "wb") as f:
-            pickle.dump(self.seen, f)
+        with self.lock, span("cache.match.save"):
+            self.db.commit()
+            # Fold the WAL back so the .db file alone holds everything
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
-    def prune_cache(self, cache: dict) -> dict:
-        now = datetime.now()
+    def clear_expired(self):
         # Keep only those whose match date is >= now (future or today)
-        pruned_cache = {h: d for h, d in cache.items() if d >= now}
-        return pruned_cache
+        with self.lock, span("cache.match.clear_expired"):
+            cursor = self.db.execute("DELETE FROM seen WHERE date < ?", (datetime.now().isoformat(),))
+            if cursor.rowcount:
+                self.dirty = True
 
-    def clear_expired(self):
-        self.seen = self.prune_cache(self.seen)
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
     
 if __name__ == "__main__":
     cache = MatchCache()
+    for sha, d, state in cache.db.execute("SELECT hash, date, state FROM seen ORDER BY date"):
+        print(sha, d, state)
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import pickle
+import re
+import threading
+from dataclasses import dataclass, asdict
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from config import *
+from models import Match
+from instrument import log, count
+from state import atomic_dump
+
+# Start of every match block: the header div, then the div of its players
+BLOCK_START_RE = re.compile(r'<div[^>]*class="[^"]*\bgridviewestilocabecera\b')
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.IGNORECASE)
+
+def div_end(html: str, start: int, limit: int) -> Optional[int]:
+    """End of the div opened at start, None if it is not closed before limit."""
+    depth = 0
+    for m in DIV_TAG_RE.finditer(html, start, limit):
+        if not m.group(1):
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            end = html.find(">", m.end(), limit)
+            return end + 1 if end >= 0 else None
+    return None
+
+def block_end(html: str, start: int, limit: int) -> int:
+    """
+        End of the players div following the header div at start, so the
+        last block does not run into the page footer. limit, the next block
+        or the end of the page, if the divs cannot be matched.
+    """
+    header_end = div_end(html, start, limit)
+    if header_end is not None:
+        players = DIV_TAG_RE.search(html, header_end, limit)
+        if players and not players.group(1):
+            end = div_end(html, players.start(), limit)
+            if end is not None:
+                return end
+    return limit
+
+def split_blocks(html: str) -> Optional[list[str]]:
+    """Raw HTML of every match block of a grid page, None if none is found."""
+    starts = [m.start() for m in BLOCK_START_RE.finditer(html)]
+    if not starts:
+        return None
+    limits = starts[1:] + [len(html)]
+    return [html[start:block_end(html, start, limit)] for (start, limit) in zip(starts, limits)]
+
+def fingerprint(block: str) -> str:
+    return hashlib.sha1(block.encode("utf-8")).hexdigest()
+
+@dataclass
+class SlotChange:
+    kind: str               # new, changed, filled or vanished
+    date: datetime
+    court: str
+    players_needed: int
+    joined: tuple[str, ...] = ()
+    left: tuple[str, ...] = ()
+
+    def __str__(self):
+        s = f"[{self.date.strftime('%Y-%m-%d %H:%M')}] {self.court} {self.kind}, needs {self.players_needed}"
+        if self.joined:
+            s += f", joined: {', '.join(self.joined)}"
+        if self.left:
+            s += f", left: {', '.join(self.left)}"
+        return s
+
+def slot_key(match: Match) -> tuple:
+    return (match.date, match.court)
+
+def diff_day(previous: list[Match], current: list[Match]) -> list[SlotChange]:
+    """Compare the matches of the same day between two polls, slot by slot."""
+    before = {slot_key(m): m for m in previous}
+    after = {slot_key(m): m for m in current}
+    changes = []
+    for key, m in after.items():
+        old = before.get(key)
+        if old is None:
+            changes.append(SlotChange("new", m.date, m.court, m.players_needed))
+        elif old is not m:
+            old_names = {p.name for p in old.active_players()}
+            new_names = {p.name for p in m.active_players()}
+            if old_names == new_names and old.level == m.level:
+                continue
+            kind = "filled" if m.players_needed == 0 < old.players_needed else "changed"
+            changes.append(SlotChange(kind, m.date, m.court, m.players_needed,
+                                      joined=tuple(sorted(new_names - old_names)),
+                                      left=tuple(sorted(old_names - new_names))))
+    for key, m in before.items():
+        if key not in after:
+            changes.append(SlotChange("vanished", m.date, m.court, m.players_needed))
+    return changes
+
+class BlockTracker:
+    """
+        Remember the match parsed out of every block of the day pages, keyed
+        by the fingerprint of the block raw HTML, so only new or modified
+        blocks are parsed again. The verdict of the filters that only read the
+        block (see MatchPipeline) is kept per fingerprint too.
+
+        state = {
+            "days": {"[club/]YYYY-MM-DD": {fingerprint: match or None, ...}, ...},
+            "verdicts": {fingerprint: bool, ...},
+            "filters": description of the filters the verdicts come from,
+        }
+    """
+    def __init__(self, path=BLOCKS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.changes: list[SlotChange] = []
+        # id(match) -> (fingerprint, match) for the matches of the current
+        # blocks, the match is kept to make sure the id is not a recycled one
+        self.fingerprints: dict[int, tuple[str, Match]] = {}
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            state = {"days": {}, "verdicts": {}, "filters": None}
+        except Exception:
+            # Written with older versions of the models
+            state = {"days": {}, "verdicts": {}, "filters": None}
+        self.days: dict[str, dict[str, Optional[Match]]] = state["days"]
+        self.verdicts: dict[str, bool] = state["verdicts"]
+        self.filters_key: Optional[str] = state["filters"]
+
+    def parse_day(self, html: str, day: date, parse_blocks: Callable[[list[str], date], list[Optional[Match]]],
+                  key: Optional[str] = None) -> Optional[tuple[list[Match], bool]]:
+        """
+            Return the matches of the page and whether a block appeared or
+            vanished since the last poll (always true for the first one),
+            only calling parse_blocks for the new blocks, all of them at once.
+            None if the page could not be split into blocks, the caller must
+            then parse it as a whole. key tells apart the pages of the same
+            day, the date by default.
+        """
+        blocks = split_blocks(html)
+        if blocks is None:
+            return None
+
+        key = key or day.isoformat()
+        with self.lock:
+            previous = self.days.get(key)
+        known = previous or {}
+
+        current: dict[str, Optional[Match]] = {}
+        new: dict[str, str] = {}
+        for block in blocks:
+            fp = fingerprint(block)
+            if fp in known:
+                current[fp] = known[fp]
+                count("blocks.reused")
+            else:
+                # Placeholder keeping the page order
+                current[fp] = None
+                new[fp] = block
+        if new:
+            for fp, match in zip(new, parse_blocks(list(new.values()), day)):
+                current[fp] = match
+            count("blocks.parsed", len(new))
+            self.dirty = True
+
+        matches = [m for m in current.values() if m]
+        # The rest of the page (footer, scripts, timestamps) changes at every poll
+        changed = previous is None or current.keys() != previous.keys()
+        with self.lock:
+            for m in known.values():
+                if m:
+                    self.fingerprints.pop(id(m), None)
+            for fp, m in current.items():
+                if m:
+                    self.fingerprints[id(m)] = (fp, m)
+            if previous is not None:
+                changes = diff_day([m for m in previous.values() if m], matches)
+                for change in changes:
+                    count(f"changes.{change.kind}")
+                    log.info("%s", change)
+                self.changes.extend(changes)
+            self.days[key] = current
+        return (matches, changed)
+
+    def use_filters(self, filters: list) -> None:
+        """Drop the verdicts if the filters or their settings changed."""
+        # Sets are sorted, their order changes with the string hash seed
+        key = repr([(type(f).__name__, sorted((k, sorted(v) if isinstance(v, (set, frozenset)) else v)
+                                              for k, v in vars(f).items()))
+                    for f in filters])
+        with self.lock:
+            if key != self.filters_key:
+                self.verdicts = {}
+                self.filters_key = key
+                self.dirty = True
+
+    def fingerprint_of(self, match: Match) -> Optional[str]:
+        entry = self.fingerprints.get(id(match))
+        if entry and entry[1] is match:
+            return entry[0]
+        return None
+
+    def verdict(self, match: Match) -> Optional[bool]:
+        fp = self.fingerprint_of(match)
+        return self.verdicts.get(fp) if fp else None
+
+    def set_verdict(self, match: Match, verdict: bool):
+        fp = self.fingerprint_of(match)
+        if fp and self.verdicts.get(fp) != verdict:
+            with self.lock:
+                self.verdicts[fp] = verdict
+                self.dirty = True
+
+    def clear_expired(self):
+        today = date.today().isoformat()
+        with self.lock:
+            days = {key: blocks for key, blocks in self.days.items() if key.rsplit("/", 1)[-1] >= today}
+            if len(days) != len(self.days):
+                self.dirty = True
+            self.days = days
+            live_matches = {id(m) for blocks in days.values() for m in blocks.values() if m}
+            self.fingerprints = {k: v for k, v in self.fingerprints.items() if k in live_matches}
+            live = {fp for blocks in self.days.values() for fp in blocks}
+            self.verdicts = {fp: v for fp, v in self.verdicts.items() if fp in live}
+
+    def reset(self):
+        """Forget every page, e.g. between benchmark runs, the object being shared."""
+        with self.lock:
+            self.days.clear()
+            self.verdicts.clear()
+            self.fingerprints.clear()
+            self.changes.clear()
+            self.filters_key = None
+            self.dirty = False
+
+    def save(self):
+        with self.lock:
+            atomic_dump({"days": self.days, "verdicts": self.verdicts, "filters": self.filters_key}, self.path)
+
+    def write_changes(self, path=CHANGES_PATH):
+        """Write the changes seen since the last call, which are then forgotten."""
+        with self.lock:
+            changes = [dict(asdict(c), date=c.date.isoformat()) for c in self.changes]
+            self.changes.clear()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(changes, f, indent=2)
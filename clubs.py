@@ -0,0 +1,80 @@
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from config import *
+
+@dataclass(frozen=True)
+class Court:
+    label: str          # as shown on the grid, e.g. "Terrain 1"
+    number: int
+    duration: int       # minutes
+
+@dataclass(frozen=True)
+class Club:
+    """
+        A matchpoint.com.es club: its site, where it is and how its grid
+        labels map to courts and match durations.
+    """
+    name: str
+    base_url: str
+    location: str
+    courts: tuple[Court, ...]
+    grid_query: str = "c=3"
+
+    @property
+    def link_prefix(self) -> str:
+        return f"{self.base_url}/Matches/"
+
+    def grid_url(self, day: date) -> str:
+        return self.link_prefix + f"Grid.aspx?f={day.strftime('%d/%m/%Y')}&{self.grid_query}"
+
+    def split_court(self, text: str) -> Optional[tuple[Court, str]]:
+        """
+            Split the "<court label> <start time>" text of a match link,
+            None if it starts with none of the known labels.
+        """
+        # Longest first so "Court 1" does not shadow "Court 10"
+        for court in sorted(self.courts, key=lambda c: len(c.label), reverse=True):
+            if text.startswith(court.label):
+                return (court, text[len(court.label):].strip())
+        return None
+
+    @staticmethod
+    def from_dict(d: dict) -> "Club":
+        return Club(
+            name=d["name"],
+            base_url=d["base_url"].rstrip("/"),
+            location=d["location"],
+            courts=tuple(Court(label=c["label"], number=int(c["number"]), duration=int(c["duration"]))
+                         for c in d["courts"]),
+            grid_query=d.get("grid_query", "c=3"),
+        )
+
+# The club the app was written for, its matches are still built as UrbanMatch
+URBAN = Club(
+    name="urban",
+    base_url=URL,
+    location="Lausanne",
+    courts=(
+        Court("Terrain 1", 1, 60),
+        Court("Terrain 2", 2, 90),
+        Court("Terrain 3", 3, 60),
+        Court("Terrain 4", 4, 90),
+    ),
+)
+
+def load_clubs(path: str = CLUBS_PATH) -> list[Club]:
+    """
+        Read the clubs JSON file, e.g.
+        [{"name": "urban"},
+         {"name": "other", "base_url": "https://otherclub.matchpoint.com.es", "location": "Geneve",
+          "courts": [{"label": "Pista 1", "number": 1, "duration": 90}, ...]}, ...]
+        "urban" alone stands for the built-in club. Falls back to the Urban club.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [URBAN if d == {"name": URBAN.name} else Club.from_dict(d) for d in json.load(f)]
+    except FileNotFoundError:
+        return [URBAN]
@@ -1,20 +1,94 @@
-from dotenv import load_dotenv
 import os
 
 # Load .env only if running locally (not in GitHub Actions)
 if not os.getenv("GITHUB_ACTIONS"):
+    from dotenv import load_dotenv
     load_dotenv()  # Loads environment variables from .env into os.environ
 
 TELEGRAM_API_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-URL = "https://urbanpadellausanne.matchpoint.com.es"
+# Overridden by the benchmarks to point to the local replay server
+URL = os.getenv("PADEL_URL", "https://urbanpadellausanne.matchpoint.com.es")
 NOTIFICATION_METHOD = "telegram"
 
+# Notification dispatcher (see notifier.py)
+NOTIFY_WORKERS = 2
+NOTIFY_RATE = 1.0               # messages per second, Telegram allows ~1/s per chat
+NOTIFY_RETRIES = 3
+NOTIFY_BACKOFF = 1.0            # seconds, doubled at each retry
+NOTIFY_COALESCE = 1             # > 1 to group queued matches in one message
+NOTIFY_COALESCE_WINDOW = 0.5    # seconds to wait for more matches to group
+
 DAY_CHECKING_PERIOD = 13
 
+# Number of day pages fetched in parallel (1 = sequential)
+MAX_FETCH_WORKERS = int(os.getenv("PADEL_FETCH_WORKERS", "4"))
+
+# BeautifulSoup backend, lxml when installed if not set
+HTML_PARSER_BACKEND = os.getenv("PADEL_HTML_PARSER")
+
+# Processes parsing the changed match blocks (0 = one per core, 1 = in process)
+PARSE_WORKERS = int(os.getenv("PADEL_PARSE_WORKERS", "0"))
+# Fewer new blocks than this in a page are parsed in process, not worth a round trip
+PARSE_POOL_MIN_BLOCKS = 40
+
+# JSON timings and counters of the last run (see instrument.py)
+RUN_SUMMARY_PATH = "run_summary.json"
+
+# Shared HTTP session settings (see http_client.py)
+HTTP_TIMEOUT = (5, 20)  # (connect, read) in seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5      # sleeps 0.5s, 1s, 2s between retries
+HTTP_POOL_HOSTS = 10    # club sites + telegram
+HTTP_POOL_SIZE = max(10, MAX_FETCH_WORKERS)
+# Per host limits shared by all the threads (see http_client.py)
+HTTP_HOST_MAX_CONCURRENCY = 4
+# Seconds between two requests starting on the same host, none by default:
+# a delay serializes the requests of the fetch workers to one club
+HTTP_HOST_DELAY = 0
+
+# Clubs scraped (see clubs.py), the Urban club only if missing
+CLUBS_PATH = "clubs.json"
+
+# On disk HTTP response cache (see http_cache.py)
+HTTP_CACHE_DIR = "http_cache"
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Match blocks of the last poll and their filter verdicts (see changes.py)
+BLOCKS_PATH = "blocks.pkl"
+# New, changed, filled and vanished slots of the last run
+CHANGES_PATH = "changes.json"
+
+# History of the observed matches (see archive.py)
+ARCHIVE_PATH = "archive.db"
+
+# Shared by concurrent processes (see cache.py and state.py)
+SQLITE_BUSY_TIMEOUT = 30        # seconds waiting for another process' write
+MATCH_CLAIM_TIMEOUT = 900       # seconds before the claim of a dead process can be taken over
+
+# Local query API over the open matches polled by the watcher (see api.py)
+API_HOST = "127.0.0.1"
+API_PORT = int(os.getenv("PADEL_API_PORT", "8080"))
+API_CACHE_ENTRIES = 256         # cached answers, dropped whenever the index changes
+API_CACHE_TTL = 60              # seconds, matches about to start leave the answers
+
+# Persistent player profile cache (see player_cache.py)
+PLAYER_CACHE_PATH = "players.pkl"
+PLAYER_CACHE_TTL_DAYS = 7
+
+# Watch mode (see watch.py), intervals in seconds
+WATCH_NEAR_DAYS = 2             # today and tomorrow
+WATCH_NEAR_INTERVAL = 120
+WATCH_FAR_INTERVAL = 1800
+WATCH_MIN_INTERVAL = 30
+WATCH_SAVE_INTERVAL = 600
+
 MY_LEVEL = 2.13
 
 MIN_PARTNER_LEVEL = 1.5
 
-urban_link_prefix = f"https://urbanpadellausanne.matchpoint.com.es/Matches/"
\ No newline at end of file
+# Players routed by subscriptions.SubscriptionIndex, the single player above if missing
+SUBSCRIBERS_PATH = "subscribers.json"
+
+urban_link_prefix = f"{URL}/Matches/"
\ No newline at end of file
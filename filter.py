@@ -1,11 +1,17 @@
 from typing import Optional, Iterator
-from models import Match
+from models import Match, name_key
 from config import *
-from datetime import datetime
+from datetime import datetime, time
+from dataclasses import dataclass
+from time import perf_counter
 
-from scraper import get_matches2
+from instrument import log, span, count
 
 class BaseMatchFilter:
+    # Set when the filter reads player fields only found on the profile page
+    needs_profile: bool = False
+    # Cleared when the verdict for the same match can change over time
+    static: bool = True
 
     def __call__(self, match: Match) -> bool:
         print("base match filter class")
@@ -17,6 +23,7 @@ class MatchOpenFilter(BaseMatchFilter):
         return 0 < match.players_needed < 4
 
 class MatchFutureFilter(BaseMatchFilter):
+    static = False
 
     def __call__(self, match: Match) -> bool:
         return match.date >= datetime.now()
@@ -40,6 +47,8 @@ class MatchMyLevelFilter(BaseMatchFilter):
             return False
 
 class MatchPartnerLevelFilter(BaseMatchFilter):
+    needs_profile = True
+
     def __init__(self, level: float):
         self.min_level = level
 
@@ -52,14 +61,23 @@ class MatchPartnerLevelFilter(BaseMatchFilter):
 
 class MatchPartnerNameFilter(BaseMatchFilter):
     def __init__(self, player_names: list[str]):
-        self.player_names = player_names
+        self.player_names = frozenset(name_key(n) for n in player_names)
 
     def __call__(self, match: Match) -> bool:
         for p in match.active_players():
-            if p.name.lower() in self.player_names:
+            if name_key(p.name) in self.player_names:
                 return False
         return True
 
+class MatchTimeWindowFilter(BaseMatchFilter):
+    def __init__(self, windows: list[tuple[time, time]]):
+        # [(start, end), ...], a match must start in one of them
+        self.windows = windows
+
+    def __call__(self, match: Match) -> bool:
+        start = match.date.time()
+        return any(w_start <= start <= w_end for (w_start, w_end) in self.windows)
+
 filters: list[BaseMatchFilter] = [
     MatchOpenFilter(),
     MatchFutureFilter(),
@@ -68,6 +86,105 @@ filters: list[BaseMatchFilter] = [
     MatchPartnerLevelFilter(level=MIN_PARTNER_LEVEL),
 ]
 
+@dataclass
+class FilterStats:
+    seen: int = 0           # matches evaluated
+    rejected: int = 0
+    seconds: float = 0.0
+
+    def cost(self) -> float:
+        """Seconds per evaluated match."""
+        return self.seconds / self.seen if self.seen else 0.0
+
+    def reject_rate(self) -> float:
+        return self.rejected / self.seen if self.seen else 0.0
+
+    def rank(self) -> float:
+        """
+            Expected cost per rejected match, running filters by increasing
+            rank minimises the total cost of a chain of independent filters.
+            Filters never seen run first so they get measured.
+        """
+        if not self.seen:
+            return 0.0
+        if not self.rejected:
+            return float("inf")
+        return self.cost() / self.reject_rate()
+
+class FilterPipeline:
+    """
+        Filter chain evaluated one batch of matches at a time, each filter
+        being timed over the whole batch. After every batch the filters are
+        reordered by FilterStats.rank so cheap and selective ones go first.
+        The filters that need player profiles always run last, after the
+        profiles of the remaining matches were fetched in one batch.
+    """
+    def __init__(self, filters: list[BaseMatchFilter], reorder: bool = True):
+        self.grid_filters = [f for f in filters if not f.needs_profile]
+        self.profile_filters = [f for f in filters if f.needs_profile]
+        self.reorder = reorder
+        self.stats: dict[int, FilterStats] = {id(f): FilterStats() for f in filters}
+
+    @property
+    def filters(self) -> list[BaseMatchFilter]:
+        return self.grid_filters + self.profile_filters
+
+    def run(self, matches: list[Match], filters: list[BaseMatchFilter]) -> list[Match]:
+        for f in filters:
+            if not matches:
+                break
+            name = type(f).__name__
+            start = perf_counter()
+            with span(f"filter.{name}"):
+                kept = [m for m in matches if f(m)]
+            stats = self.stats[id(f)]
+            stats.seen += len(matches)
+            stats.rejected += len(matches) - len(kept)
+            stats.seconds += perf_counter() - start
+            count(f"filter.{name}.rejected", len(matches) - len(kept))
+            matches = kept
+        return matches
+
+    def filter(self, matches: list[Match]) -> list[Match]:
+        matches = self.run(matches, self.grid_filters)
+        if self.profile_filters and matches:
+            with span("enrich"):
+                # Only needed, and imported, when a profile filter runs
+                from scraper import enrich_players
+                enrich_players(p for m in matches for p in m.active_players())
+            matches = self.run(matches, self.profile_filters)
+
+        if self.reorder:
+            self.grid_filters.sort(key=lambda f: self.stats[id(f)].rank())
+            self.profile_filters.sort(key=lambda f: self.stats[id(f)].rank())
+        return matches
+
+    def report(self) -> dict[str, dict]:
+        report = {}
+        for f in self.filters:
+            stats = self.stats[id(f)]
+            report[type(f).__name__] = {
+                "seen": stats.seen,
+                "rejected": stats.rejected,
+                "reject_rate": stats.reject_rate(),
+                "us_per_match": stats.cost() * 1e6,
+            }
+            log.info("%s: %d/%d rejected, %.2fus/match", type(f).__name__,
+                     stats.rejected, stats.seen, stats.cost() * 1e6)
+        return report
+
+def filter_matches(matches: list[Match], filters: list[BaseMatchFilter]) -> list[Match]:
+    """
+        Run the filters that only need the grid data first, then fetch the
+        missing player profiles of the remaining matches (in one batch) before
+        running the filters that need them.
+    """
+    return FilterPipeline(filters, reorder=False).filter(matches)
+
+def apply_filters(matches: list[Match], filters: list[BaseMatchFilter]) -> list[Match]:
+    """Same as all(f(m) for f in filters) per match, but timed per filter class."""
+    return FilterPipeline(filters, reorder=False).run(matches, filters)
+
 if __name__ == "__main__":
     filters: list[BaseMatchFilter] = [
         MatchOpenFilter(),
@@ -77,8 +194,8 @@ if __name__ == "__main__":
         MatchPartnerLevelFilter(level=MIN_PARTNER_LEVEL),
     ]
 
+    from scraper import get_matches2
     matches = get_matches2()
 
-    for match in matches:
-        if all(f(match) for f in filters):
-            print(match)
\ No newline at end of file
+    for match in filter_matches(matches, filters):
+        print(match)
\ No newline at end of file
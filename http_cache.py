@@ -0,0 +1,184 @@
+import hashlib
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+import http_client
+from config import *
+from instrument import span, count
+from state import atomic_dump, atomic_write, file_lock
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    digest: str         # sha256 of the body
+    unchanged: bool     # Same body as the previous fetch (304 or same digest)
+
+class HttpCache:
+    """
+    On disk response cache, revalidated with ETag/Last-Modified when the
+    server sends them and compared by content hash otherwise.
+
+    index = {
+        url1: {"key": ..., "etag": ..., "last_modified": ..., "digest": ...,
+               "parsed_digest": ..., "size": ..., "used_at": datetime},
+        ...
+    }
+    Bodies are stored in <path>/<key>.html and parse results of a body in
+    <path>/<key>.parsed. Least recently used entries are evicted once the
+    cache grows above max_bytes.
+    """
+    def __init__(self, path=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Only new bodies or parse results count, not access times nor grid bodies
+        self.dirty = False
+        os.makedirs(self.path, exist_ok=True)
+        with span("cache.http.load"):
+            self.index: dict[str, dict] = self.load_index()
+
+    def load_index(self) -> dict[str, dict]:
+        try:
+            with open(self.index_path(), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return dict()
+
+    def index_path(self) -> str:
+        return os.path.join(self.path, "index.pkl")
+
+    def file_path(self, entry: dict, ext: str) -> str:
+        return os.path.join(self.path, f"{entry['key']}.{ext}")
+
+    def read_body(self, entry: dict) -> Optional[str]:
+        try:
+            with open(self.file_path(entry, "html"), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def fetch(self, url: str, tracked: bool = True) -> CachedPage:
+        """
+            tracked=False for the pages whose changes are followed elsewhere,
+            e.g. the grid pages by changes.BlockTracker: a new body of theirs
+            is stored but does not make the cache dirty, their footer changes
+            at every fetch.
+        """
+        with self.lock:
+            entry = self.index.get(url)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = http_client.get(url, headers=headers)
+
+        if response.status_code == 304 and entry:
+            text = self.read_body(entry)
+            if text is not None:
+                with self.lock:
+                    entry["used_at"] = datetime.now()
+                count("http_cache.not_modified")
+                return CachedPage(url, text, entry["digest"], unchanged=True)
+            # Body was evicted behind our back, fetch it again unconditionally
+            response = http_client.get(url)
+
+        response.raise_for_status()
+        text = response.text
+        digest = hashlib.sha256(response.content).hexdigest()
+        unchanged = bool(entry) and entry["digest"] == digest
+        count("http_cache.same_body" if unchanged else "http_cache.new_body")
+
+        new_entry = {
+            "key": hashlib.sha1(url.encode("utf-8")).hexdigest(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest,
+            "parsed_digest": entry.get("parsed_digest") if unchanged else None,
+            "size": entry["size"] if unchanged else len(response.content),
+            "used_at": datetime.now(),
+        }
+        if not unchanged:
+            atomic_write(self.file_path(new_entry, "html"), text)
+        with self.lock:
+            self.index[url] = new_entry
+            if not unchanged and tracked:
+                self.dirty = True
+        return CachedPage(url, text, digest, unchanged)
+
+    def load_parsed(self, page: CachedPage) -> Optional[Any]:
+        """Return what was parsed out of this very same body last time, if any."""
+        with self.lock:
+            entry = self.index.get(page.url)
+        if not entry or entry.get("parsed_digest") != page.digest:
+            return None
+        try:
+            with open(self.file_path(entry, "parsed"), "rb") as f:
+                parsed = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Unreadable or written with older versions of the models, parse again
+            return None
+        count("http_cache.parse_skipped")
+        return parsed
+
+    def store_parsed(self, page: CachedPage, parsed: Any):
+        with self.lock:
+            entry = self.index.get(page.url)
+        if not entry or entry["digest"] != page.digest:
+            return
+        data = pickle.dumps(parsed)
+        atomic_write(self.file_path(entry, "parsed"), data)
+        with self.lock:
+            entry["parsed_digest"] = page.digest
+            self.dirty = True
+            entry["size"] = len(page.text.encode("utf-8")) + len(data)
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = sum(e["size"] for e in self.index.values())
+        for url, entry in sorted(self.index.items(), key=lambda kv: kv[1]["used_at"]):
+            if total <= self.max_bytes:
+                break
+            for ext in ("html", "parsed"):
+                try:
+                    os.remove(self.file_path(entry, ext))
+                except FileNotFoundError:
+                    pass
+            total -= entry["size"]
+            del self.index[url]
+            self.dirty = True
+
+    def save(self):
+        """Merge with the entries saved by other processes meanwhile, the latest used wins."""
+        with self.lock, span("cache.http.save"), file_lock(self.index_path()):
+            for url, e in self.load_index().items():
+                mine = self.index.get(url)
+                if mine is None or e["used_at"] > mine["used_at"]:
+                    self.index[url] = e
+            self.evict()
+            atomic_dump(self.index, self.index_path())
+
+_cache: HttpCache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> HttpCache:
+    """Return the process wide cache, loading the index on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
+
+def fetch(url: str, tracked: bool = True) -> CachedPage:
+    return get_cache().fetch(url, tracked)
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from config import *
+from instrument import span, count
+
+if TYPE_CHECKING:
+    import requests
+
+# Keyed by whether the session retries, see build_session
+_sessions: dict[bool, "requests.Session"] = {}
+_session_lock = threading.Lock()
+
+def build_session(retry: bool = True) -> "requests.Session":
+    """
+        Build a session that keeps connections alive and pools them per host.
+        Idempotent requests are retried with exponential backoff on connection
+        errors and on 429/5xx answers (honouring Retry-After). retry=False is
+        for the requests that must not be sent twice, e.g. Telegram's
+        sendMessage, whose caller decides what to retry.
+        requests is only imported here, with the first request of the run.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    policy = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=policy if retry else 0,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session(retry: bool = True) -> "requests.Session":
+    """Return the process wide session, creating it on first use."""
+    session = _sessions.get(retry)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retry)
+            if session is None:
+                session = _sessions[retry] = build_session(retry)
+    return session
+
+def page_type(url: str) -> tuple[str, str]:
+    """("urbanpadellausanne.matchpoint.com.es", "Grid.aspx"), ("api.telegram.org", "sendMessage")..."""
+    parsed = urlparse(url)
+    return (parsed.hostname, parsed.path.rsplit("/", 1)[-1])
+
+class HostLimiter:
+    """
+        Politeness towards every host: at most max_concurrency requests in
+        flight and at least delay seconds between two requests starting.
+        Each host has its own slots, so a slow club does not hold back the
+        requests to the other ones.
+    """
+    def __init__(self, max_concurrency: int = HTTP_HOST_MAX_CONCURRENCY, delay: float = HTTP_HOST_DELAY):
+        self.max_concurrency = max_concurrency
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.slots: dict[str, threading.BoundedSemaphore] = {}
+        self.next_start: dict[str, float] = {}
+
+    def slot(self, host: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.slots:
+                self.slots[host] = threading.BoundedSemaphore(max(1, self.max_concurrency))
+            return self.slots[host]
+
+    def wait_turn(self, host: str):
+        """Book the next start time of the host and sleep until then."""
+        if not self.delay:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start.get(host, now))
+            self.next_start[host] = start + self.delay
+        if start > now:
+            count(f"http.{host}.delayed")
+            time.sleep(start - now)
+
+limiter = HostLimiter()
+
+def get(url: str, retry: bool = True, **kwargs) -> "requests.Response":
+    """Drop-in replacement for requests.get going through the shared session."""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    host, page = page_type(url)
+    count(f"http.{host}.{page}")
+    with limiter.slot(host):
+        limiter.wait_turn(host)
+        with span(f"http.{host}.{page}"):
+            return get_session(retry).get(url, **kwargs)
+
+def close():
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from config import *
+
+log = logging.getLogger("padel")
+
+def setup_logging():
+    """Diagnostics go through `log`, DEBUG messages are skipped unless PADEL_LOG_LEVEL=DEBUG."""
+    logging.basicConfig(
+        level=os.getenv("PADEL_LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+class RunStats:
+    """
+    Timing spans and counters of a run, safe to update from worker threads.
+
+    spans = {"parse.grid": {"count": 13, "seconds": 1.2}, ...}
+    counters = {"http_cache.not_modified": 4, ...}
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.spans: dict[str, dict] = {}
+        self.counters: dict[str, int] = {}
+
+    def add_span(self, name: str, seconds: float):
+        with self.lock:
+            s = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+            s["count"] += 1
+            s["seconds"] += seconds
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "spans": {k: dict(v) for k, v in sorted(self.spans.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+stats = RunStats()
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block, spans of the same name are summed."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_span(name, time.perf_counter() - start)
+
+def count(name: str, n: int = 1):
+    stats.count(name, n)
+
+def write_summary(path: str = RUN_SUMMARY_PATH) -> dict:
+    summary = stats.summary()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    log.info("Run summary written to %s (%.2fs)", path, summary["wall_seconds"])
+    return summary
+
+@contextmanager
+def profiled() -> Iterator[None]:
+    """Run the block under cProfile when PADEL_PROFILE=<output path> is set."""
+    path = os.getenv("PADEL_PROFILE")
+    if not path:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        log.info("Profile written to %s", path)
@@ -1,35 +1,40 @@
-from scraper import get_matches2
+import time
+started = time.perf_counter()
+
+from instrument import setup_logging, profiled, write_summary, log, stats
+from scraper import iter_matches2
+from archive import MatchArchive
 from cache import MatchCache
 from filter import filters
-from notifier import send_notification
-from models import Match
+from pipeline import MatchPipeline, save_state, report_dirty
+
+# The notifier, bs4 and the player cache are only loaded if the run needs them
+stats.add_span("startup.imports", time.perf_counter() - started)
 
-import csv
+def main():
+    setup_logging()
 
-matches = get_matches2()
+    with profiled():
+        cache = MatchCache()
+        archive = MatchArchive()
 
-cache = MatchCache()
+        pipeline = MatchPipeline(cache, filters, archive)
 
-Match.csv_header()
+        stats.add_span("startup", time.perf_counter() - started)
+        log.info("Started in %.3fs (imports %.3fs)", stats.spans["startup"]["seconds"],
+                 stats.spans["startup.imports"]["seconds"])
 
-with open("raw_matches.csv", mode="w", encoding="utf-8") as raw_f, \
-     open("filtered_matches.csv", mode="w", encoding="utf-8") as filt_f:
+        # Each day is filtered and notified as soon as it is scraped
+        try:
+            for day, matches in iter_matches2():
+                pipeline.process(matches)
+        finally:
+            pipeline.close()
 
-    raw_writer = csv.writer(raw_f)
-    filt_writer = csv.writer(filt_f)
-    raw_writer.writerow(Match.csv_header())
-    filt_writer.writerow(Match.csv_header())
+        report_dirty(save_state(cache, archive))
 
-    for match in matches:
-        raw_writer.writerow(match.csv_row())
-        if all(f(match) for f in filters):
-            # Dump filtered matches
-            filt_writer.writerow(match.csv_row())
-            # print(f"STABLE: {match.stable_hash()}")
-            if not cache.has_seen(match):
-                send_notification(match)
-                # print(f"Notify {match}")
-                cache.add(match)
+    write_summary()
 
-cache.clear_expired()
-cache.save()
\ No newline at end of file
+# The parse workers import this module again, see scraper.ParsePool
+if __name__ == "__main__":
+    main()
\ No newline at end of file
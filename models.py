@@ -2,14 +2,26 @@ from dataclasses import dataclass, field
 from datetime import date, datetime, time, timedelta
 from typing import Optional, Iterator
 from enum import IntEnum
+from functools import lru_cache
 import hashlib
+import sys
 
 DEFAULT_PLAYER_NAME = "libre"
 
-@dataclass
+@lru_cache(maxsize=8192)
+def name_key(name: str) -> str:
+    """Lower cased name compared by the name filters, the same names keep coming back."""
+    return sys.intern(name.lower())
+
+# Frozen: one player object is shared by all the matches it shows up in
+@dataclass(slots=True, frozen=True)
 class BasePlayer:
     name: str
 
+    def __post_init__(self):
+        # The same regulars show up in many matches, share their name strings
+        object.__setattr__(self, "name", sys.intern(self.name))
+
     def is_empty(self) -> bool:
         # Treat empty or "libre" (free) players as empty
         return self.name.strip().lower() in ("", DEFAULT_PLAYER_NAME)
@@ -20,27 +32,44 @@ class BasePlayer:
     def __hash__(self):
         return hash((self.name))
 
-@dataclass
+# Compared on all the fields, so a changed level or link changes the match
+# (see api.MatchIndex.update), hashed by name as BasePlayer
+@dataclass(slots=True, frozen=True)
 class Player(BasePlayer):
-    level: float
+    """
+        What the grid tells about a player. The level is the one printed
+        on the grid, subclasses may know it from elsewhere (see ScrapePlayer).
+    """
+    grid_level: Optional[float]
     link: str
-    position: str
-    note: Optional[float] = None
+    position: Optional[str]
 
-    def __str__(self):
-        return f"{self.name} ({self.level})"
+    @property
+    def level(self) -> Optional[float]:
+        return self.grid_level
+
+    @property
+    def note(self) -> Optional[float]:
+        return None
 
     def __hash__(self):
         return hash((self.name))
 
+    def __str__(self):
+        return f"{self.name} ({self.level})"
+
 EmptyPlayer = BasePlayer(name=DEFAULT_PLAYER_NAME)
 
-@dataclass
+@dataclass(slots=True)
 class Match:
     """
         We should add criteria related to match level and my level
         We should add criteria related to player names
         We should add criteria related to player levels
+
+        Fields must not be changed once built: the values derived from them
+        (players needed, active players, stable hash) are computed once in
+        __post_init__.
     """
 
     date: datetime          # Full date and time of the match
@@ -55,29 +84,32 @@ class Match:
     players_needed: int = field(init=False)
     min_level: float = field(init=False)
     max_level: float = field(init=False)
+    _active_players: tuple[Player, ...] = field(init=False, repr=False, compare=False)
+    _stable_hash: int = field(init=False, repr=False, compare=False)
 
     @staticmethod
     def csv_header() -> tuple[str]:
         return ("date","court","player_a0","player_a1","player_b0","player_b1")
 
     def __post_init__(self):
-        # Compute the winner right after init
-        self.players_needed = sum(
-            1 for p in self.a_team + self.b_team if p.is_empty()
-        )
+        players = self.a_team + self.b_team
+        self._active_players = tuple(p for p in players if not p.is_empty())
+        self.players_needed = len(players) - len(self._active_players)
         self.min_level = self.level - 1
         self.max_level = self.level + 1
+        self._stable_hash = self.compute_stable_hash()
 
-    def active_players(self) -> Iterator[Player]:
-        for player in self.a_team + self.b_team:
-            if not player.is_empty():
-                yield player
+    def active_players(self) -> tuple[Player, ...]:
+        return self._active_players
 
-    def stable_hash(self) -> int:
+    def compute_stable_hash(self) -> int:
         raw = f"{self.date.isoformat()}|{self.court}|{self.a_team[0].name}|{self.a_team[1].name}|{self.b_team[0].name}|{self.b_team[1].name}"
         digest = hashlib.sha256(raw.encode("utf-8")).digest()
         return int.from_bytes(digest[:8], byteorder='big', signed=False)
 
+    def stable_hash(self) -> int:
+        return self._stable_hash
+
     def csv_row(self) -> tuple[str]:
         return (self.date.isoformat(),self.court,self.a_team[0].name,self.a_team[1].name,self.b_team[0].name,self.b_team[1].name)
 
@@ -103,7 +135,7 @@ class UrbanCourt(IntEnum):
     COURT_3 = 3
     COURT_4 = 4
 
-@dataclass
+@dataclass(slots=True)
 class UrbanMatch(Match):
     court: str
 
@@ -124,12 +156,23 @@ class UrbanMatch(Match):
             assert 0
 
     def __post_init__(self):
-        super().__post_init__()
+        # No zero argument super() in slotted dataclasses, the class is recreated
+        Match.__post_init__(self)
         self.court_e = self.parse_court(self.court)
         if self.court_e in [UrbanCourt.COURT_2, UrbanCourt.COURT_4]:
             self.duration = 90
         else:
             self.duration = 60
 
-    def __hash__(self):
-        return super().__hash__()
+    __hash__ = Match.__hash__
+
+@dataclass(slots=True)
+class ClubMatch(Match):
+    """
+        Match of any other club of clubs.py, court being "<club>/<court label>"
+        so that the slots and stable hashes of two clubs never collide.
+    """
+    court: str
+    court_e: int    # court number in its club
+
+    __hash__ = Match.__hash__
@@ -1,6 +1,15 @@
-import requests
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+import http_client
 from models import Match
 from config import *
+from instrument import log, span, count
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
 
 def send_notification(match: Match):
     url = f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}/sendMessage"
@@ -8,12 +17,181 @@ def send_notification(match: Match):
         "chat_id": CHAT_ID,
         "text": str(match),
     }
-    requests.get(url, params=params)
+    http_client.get(url, params=params)
+
+class TokenBucket:
+    """Allow `rate` calls per second on average with bursts of up to `capacity`."""
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def split_messages(matches: list[Match]) -> list[tuple[str, list[Match]]]:
+    """
+        Group the matches in as few messages as possible, each one at most
+        MAX_MESSAGE_LENGTH long, so every match reported as sent is really
+        in its message. Only a match too long on its own is cut.
+    """
+    messages = []
+    text, grouped = "", []
+    for m in matches:
+        part = str(m)[:MAX_MESSAGE_LENGTH]
+        if grouped and len(text) + 2 + len(part) > MAX_MESSAGE_LENGTH:
+            messages.append((text, grouped))
+            text, grouped = "", []
+        text = f"{text}\n\n{part}" if grouped else part
+        grouped.append(m)
+    if grouped:
+        messages.append((text, grouped))
+    return messages
+
+class NotificationDispatcher:
+    """
+        Deliver notifications from background threads so that the scraping
+        is never blocked by Telegram.
+        * sends are rate limited by a token bucket shared by the workers
+        * 429 (honouring retry_after) and 5xx answers are retried with backoff
+        * up to `coalesce` matches queued together are sent as one message
+        * on_delivered(matches) is only called once Telegram accepted them,
+          on_failed(matches) once the retries are exhausted
+    """
+    def __init__(self, on_delivered: Callable[[list[Match]], None],
+                 workers: int = NOTIFY_WORKERS, rate: float = NOTIFY_RATE,
+                 coalesce: int = NOTIFY_COALESCE,
+                 on_failed: Optional[Callable[[list[Match]], None]] = None):
+        self.on_delivered = on_delivered
+        self.on_failed = on_failed
+        self.coalesce = max(1, coalesce)
+        self.bucket = TokenBucket(rate=rate, capacity=max(1, int(rate)))
+        self.queue: queue.Queue = queue.Queue()
+        self.pending: set[int] = set()
+        self.lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+        self.threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(max(1, workers))]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, match: Match) -> bool:
+        """Queue the match unless it is already waiting for delivery."""
+        sha = match.stable_hash()
+        with self.lock:
+            if sha in self.pending:
+                return False
+            self.pending.add(sha)
+        self.queue.put(match)
+        return True
+
+    def next_batch(self) -> list[Match]:
+        """Block for one match then grab the ones queued right after it."""
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        while len(batch) < self.coalesce:
+            try:
+                match = self.queue.get(timeout=NOTIFY_COALESCE_WINDOW)
+            except queue.Empty:
+                break
+            if match is None:
+                # Keep the stop marker for the next loop
+                self.queue.put(None)
+                break
+            batch.append(match)
+        return batch
+
+    def worker(self):
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                return
+            for text, matches in split_messages(batch):
+                with span("notify.deliver"):
+                    ok = self.deliver(text)
+                try:
+                    self.done(matches, ok)
+                except Exception:
+                    # e.g. sqlite "database is locked", the thread must keep draining the queue
+                    log.exception("Failed to record %d %s notifications", len(matches),
+                                  "delivered" if ok else "failed")
+
+    def done(self, matches: list[Match], ok: bool):
+        count("notify.delivered" if ok else "notify.failed", len(matches))
+        try:
+            if ok:
+                self.on_delivered(matches)
+            elif self.on_failed:
+                self.on_failed(matches)
+        finally:
+            # Only once recorded, a match submitted again meanwhile is not resent
+            with self.lock:
+                for m in matches:
+                    self.pending.discard(m.stable_hash())
+                if ok:
+                    self.delivered += len(matches)
+                else:
+                    self.failed += len(matches)
+
+    def deliver(self, text: str) -> bool:
+        url = f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}/sendMessage"
+        params = {
+            "chat_id": CHAT_ID,
+            "text": text,
+        }
+        for attempt in range(NOTIFY_RETRIES + 1):
+            if attempt:
+                count("notify.retries")
+            with span("notify.rate_limit_wait"):
+                self.bucket.acquire()
+            try:
+                # Retried here only, a send retried by the session too could be delivered twice
+                response = http_client.get(url, params=params, retry=False)
+            except Exception as e:
+                log.warning("Notification failed: %s", e)
+                time.sleep(NOTIFY_BACKOFF * 2 ** attempt)
+                continue
+
+            if response.status_code == 200:
+                return True
+            elif response.status_code == 429:
+                try:
+                    wait = response.json()["parameters"]["retry_after"]
+                except (ValueError, KeyError, TypeError):
+                    wait = NOTIFY_BACKOFF * 2 ** attempt
+                time.sleep(wait)
+            elif response.status_code >= 500:
+                time.sleep(NOTIFY_BACKOFF * 2 ** attempt)
+            else:
+                log.warning("Notification rejected (%d): %s", response.status_code, response.text)
+                return False
+        return False
+
+    def close(self):
+        """Wait for the queued notifications to be delivered."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        log.info("Notifications: %d delivered, %d failed", self.delivered, self.failed)
 
 if __name__ == "__main__":
     if False:
         url = f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}/getUpdates"
-        resp = requests.get(url)
+        resp = http_client.get(url)
         print(resp.json())
     else:
         MESSAGE = "🚨 New match found at 20:00 on Court 1!"
@@ -22,4 +200,4 @@ if __name__ == "__main__":
             "chat_id": CHAT_ID,
             "text": MESSAGE
         }
-        requests.get(url, params=params)
\ No newline at end of file
+        http_client.get(url, params=params)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+
+from archive import MatchArchive
+from cache import MatchCache
+from filter import BaseMatchFilter, FilterPipeline
+from models import Match
+from scraper import ScrapePlayer, block_tracker, player_registry
+import http_cache
+from instrument import log
+
+class MatchPipeline:
+    """
+        Process the matches of a day as soon as its page is parsed:
+        archive them, filter them and queue the ones not seen yet for
+        notification. Nothing is kept once a batch is processed.
+    """
+    def __init__(self, cache: MatchCache, filters: list[BaseMatchFilter], archive: MatchArchive):
+        self.cache = cache
+        self.archive = archive
+        # Started with the first match to notify, a run with nothing new
+        # never imports the notifier nor starts its threads
+        self.dispatcher = None
+        # Verdicts of the filters only reading the grid and not depending on
+        # the time are kept per block, the other ones run at every poll since
+        # the time or a profile level change while the block stays the same.
+        # Both chains are reordered by cost and selectivity as batches go through.
+        memoized = [f for f in filters if f.static and not f.needs_profile]
+        self.memoized = FilterPipeline(memoized)
+        self.recheck = FilterPipeline([f for f in filters if not (f.static and not f.needs_profile)])
+        block_tracker.use_filters(memoized)
+
+    def process(self, matches: list[Match]):
+        self.archive.record(matches, "raw")
+        filtered = self.filter(matches)
+        self.archive.record(filtered, "filtered")
+
+        for match in filtered:
+            # Atomic, a process running next to this one cannot notify it too
+            if self.cache.claim(match):
+                self.notify(match)
+
+    def notify(self, match: Match):
+        if self.dispatcher is None:
+            from notifier import NotificationDispatcher
+            # Claims are only confirmed once Telegram accepted the matches
+            self.dispatcher = NotificationDispatcher(on_delivered=self.mark_notified,
+                                                     on_failed=self.release)
+        self.dispatcher.submit(match)
+
+    def filter(self, matches: list[Match]) -> list[Match]:
+        """
+            Matches whose block did not change since the last poll keep the
+            verdict of the memoized filters, only the other ones run again.
+        """
+        fresh, reused = [], []
+        for m in matches:
+            verdict = block_tracker.verdict(m)
+            if verdict is None:
+                fresh.append(m)
+            elif verdict:
+                reused.append(m)
+
+        passed = {id(m) for m in self.memoized.filter(fresh)}
+        for m in fresh:
+            block_tracker.set_verdict(m, id(m) in passed)
+        passed.update(id(m) for m in reused)
+        candidates = [m for m in matches if id(m) in passed]
+        kept = {id(m) for m in self.recheck.filter(candidates)}
+        return [m for m in matches if id(m) in kept]
+
+    def mark_notified(self, matches: list[Match]):
+        for match in matches:
+            self.cache.confirm(match)
+        self.archive.record(matches, "notified")
+
+    def release(self, matches: list[Match]):
+        for match in matches:
+            self.cache.release(match)
+
+    def close(self):
+        """Wait for the pending notifications."""
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+        self.memoized.report()
+        self.recheck.report()
+
+def save_state(cache: MatchCache, archive: MatchArchive) -> bool:
+    """Prune and write every cache to disk, return whether any of them changed."""
+    cache.clear_expired()
+    cache.save()
+
+    archive.save()
+
+    # The shared players of the past days would pile up in watch mode
+    player_registry.clear()
+    # Not loaded at all if no profile was needed
+    player_cache = ScrapePlayer.player_cache
+    if player_cache is not None:
+        player_cache.report()
+        player_cache.clear_expired()
+        player_cache.save()
+
+    page_cache = http_cache.get_cache()
+    page_cache.save()
+
+    block_tracker.clear_expired()
+    block_tracker.save()
+    block_tracker.write_changes()
+
+    return (cache.dirty or archive.dirty or (player_cache is not None and player_cache.dirty)
+            or page_cache.dirty or block_tracker.dirty)
+
+def report_dirty(dirty: bool):
+    """Tell the GitHub workflow whether the cache needs to be saved."""
+    log.info("Cache changed: %s", dirty)
+    output = os.getenv("GITHUB_OUTPUT")
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(f"cache_dirty={'true' if dirty else 'false'}\n")
@@ -0,0 +1,104 @@
+import pickle
+import threading
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from config import *
+from instrument import log, span, count
+from state import atomic_dump, file_lock
+
+@lru_cache(maxsize=8192)
+def player_key(link: str) -> str:
+    """
+        Use the profile id of the link as key, e.g.
+        Perfil.aspx?id=159e8bb24a5a9400ea274018c752379d&return_url=... -> 159e8bb24a5a9400ea274018c752379d
+        Falls back to the link without its query arguments.
+    """
+    parsed = urlparse(link)
+    ids = parse_qs(parsed.query).get("id")
+    if ids:
+        return ids[0]
+    return parsed.path
+
+class PlayerCache:
+    """
+    cache = {
+        player_id1: {"level": 1.2, "note": 3.4, "fetched_at": datetime},
+        ...
+    }
+    Profiles older than ttl are considered stale and fetched again.
+    """
+    def __init__(self, path=PLAYER_CACHE_PATH, ttl=timedelta(days=PLAYER_CACHE_TTL_DAYS)):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        with span("cache.player.load"):
+            self.players: dict[str, dict] = self.load()
+
+    def get(self, link: str) -> Optional[dict]:
+        """Return the fresh profile of the player or None if unknown/stale."""
+        entry = self.peek(link)
+        with self.lock:
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        count("player_cache.hit" if entry else "player_cache.miss")
+        return entry
+
+    def peek(self, link: str) -> Optional[dict]:
+        """Same as get() without counting it, for the reads of the player levels."""
+        with self.lock:
+            entry = self.players.get(player_key(link))
+        if entry and datetime.now() - entry["fetched_at"] < self.ttl:
+            return entry
+        return None
+
+    def set(self, link: str, level: float, note: Optional[float]):
+        with self.lock:
+            self.players[player_key(link)] = {
+                "level": level,
+                "note": note,
+                "fetched_at": datetime.now(),
+            }
+            self.dirty = True
+
+    def clear_expired(self):
+        now = datetime.now()
+        with self.lock:
+            players = {k: e for k, e in self.players.items() if now - e["fetched_at"] < self.ttl}
+            if len(players) != len(self.players):
+                self.dirty = True
+            self.players = players
+
+    def load(self) -> dict[str, dict]:
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return dict()
+
+    def save(self):
+        """Merge with the profiles saved by other processes meanwhile, the latest fetch wins."""
+        if not self.dirty:
+            return
+        with self.lock, span("cache.player.save"), file_lock(self.path):
+            now = datetime.now()
+            for k, e in self.load().items():
+                mine = self.players.get(k)
+                if now - e["fetched_at"] < self.ttl and (mine is None or e["fetched_at"] > mine["fetched_at"]):
+                    self.players[k] = e
+            atomic_dump(self.players, self.path)
+
+    def report(self):
+        log.info("Player cache: %d hits, %d misses, %d players", self.hits, self.misses, len(self.players))
+
+if __name__ == "__main__":
+    cache = PlayerCache()
+    for k, e in cache.players.items():
+        print(k, e)
@@ -1,53 +1,130 @@
-import requests
-from bs4 import BeautifulSoup
+import http_client
+import http_cache
 import re
+import threading
 from config import *
-from models import Player, Match, EmptyPlayer, UrbanCourt, UrbanMatch
+from models import Player, Match, EmptyPlayer, UrbanCourt, UrbanMatch, ClubMatch
+from clubs import Club, URBAN, load_clubs
+from player_cache import PlayerCache, player_key
+from instrument import log, span, count, stats
+from changes import BlockTracker
 import traceback
 import unicodedata
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial, lru_cache
+from itertools import repeat
+from importlib.util import find_spec
+from urllib.parse import urljoin
 
 from datetime import date, datetime, time, timedelta
-from typing import Optional, ClassVar
+from typing import Optional, Callable, ClassVar, Iterable, Iterator
 from dataclasses import dataclass
 
-@dataclass
-class ScrapePlayer(Player):
+# lxml is several times faster than the pure python backend, use it when installed
+if HTML_PARSER_BACKEND:
+    HTML_PARSER = HTML_PARSER_BACKEND
+else:
+    # find_spec does not import it, see make_soup
+    HTML_PARSER = "lxml" if find_spec("lxml") else "html.parser"
 
-    scraped_players: ClassVar[dict[str, float]] = {}
+def make_soup(html: str):
+    """
+        bs4 (and lxml) are only imported once a page has to be parsed, a run
+        where no block changed never needs them.
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, HTML_PARSER)
 
-    def register_player(self):
-        ScrapePlayer.scraped_players[self.name] = self.level
+# eq=False keeps the __eq__/__hash__ pair of Player
+@dataclass(slots=True, frozen=True, eq=False)
+class ScrapePlayer(Player):
+    """
+        Player of the scraped grids, the level missing on the grid is the
+        one of its profile in the player cache once fetched. The player
+        itself never changes, so it can be shared between matches and
+        threads (see PlayerRegistry).
+    """
+
+    # Shared across runs, see player_cache.py. Loaded on first use, see cache()
+    player_cache: ClassVar[Optional[PlayerCache]] = None
+    player_cache_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def cache(cls) -> PlayerCache:
+        if cls.player_cache is None:
+            with cls.player_cache_lock:
+                if cls.player_cache is None:
+                    cls.player_cache = PlayerCache()
+        return cls.player_cache
+
+    def profile(self) -> Optional[dict]:
+        # Not loaded at all as long as no profile was needed
+        cache = ScrapePlayer.player_cache
+        return cache.peek(self.link) if cache is not None else None
+
+    @property
+    def level(self) -> Optional[float]:
+        if self.grid_level is not None:
+            return self.grid_level
+        profile = self.profile()
+        return profile["level"] if profile else None
+
+    @property
+    def note(self) -> Optional[float]:
+        profile = self.profile()
+        return profile["note"] if profile else None
+
+    def needs_profile(self) -> bool:
+        # The grid text only gives the level of some players
+        return self.level is None
 
     def upd_from_url(self):
-        if self.name in ScrapePlayer.scraped_players:
-            self.level = ScrapePlayer.scraped_players[self.name]
-        else:
-            url = urban_link_prefix + self.link
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            self.level = parse_player_level(soup.find("span", id=re.compile(r".*ctl00_WUCRegistroNivelJuego_LabelValorNivel$")).text.strip())
-            note = soup.find("span", id=re.compile(r".*_LabelValorPuntuacionRanking$"))
-            if note:
-                self.note = parse_player_level(note.text.strip())
-            else:
-                self.note = 0.0
-            self.register_player()
-            
-    def __hash__(self):
-        return super().__hash__()
+        """Fetch the profile into the player cache, unless it is there already."""
+        if ScrapePlayer.cache().get(self.link):
+            return
+        # Links are absolute, older pickled players may still hold relative ones
+        page = http_cache.fetch(urljoin(urban_link_prefix, self.link))
+        profile = http_cache.get_cache().load_parsed(page) if page.unchanged else None
+        if profile is None:
+            profile = parse_player_profile(page.text)
+            http_cache.get_cache().store_parsed(page, profile)
+        (level, note) = profile
+        ScrapePlayer.cache().set(self.link, level, note)
+
+PROFILE_LEVEL_ID_RE = re.compile(r"ctl00_WUCRegistroNivelJuego_LabelValorNivel$")
+PROFILE_NOTE_ID_RE = re.compile(r"_LabelValorPuntuacionRanking$")
+
+def parse_player_profile(html: str) -> tuple[float, float]:
+    """Return the (level, ranking note) found on a Perfil.aspx page."""
+    soup = make_soup(html)
+    level = parse_player_level(soup.find("span", id=PROFILE_LEVEL_ID_RE).text.strip())
+    note = soup.find("span", id=PROFILE_NOTE_ID_RE)
+    if note:
+        note = parse_player_level(note.text.strip())
+    else:
+        note = 0.0
+    return (level, note)
 
 def get_page_html() -> str:
     """Fetch the HTML of the match page."""
-    response = requests.get(URL)
+    response = http_client.get(URL)
     response.raise_for_status()
     return response.text
 
-def get_page_html2(date: datetime.date) -> str:
+def grid_url(date: datetime.date, club: Club = URBAN) -> str:
+    return club.grid_url(date)
+
+def get_page2(date: datetime.date, club: Club = URBAN) -> http_cache.CachedPage:
+    """Fetch the match page, revalidating the cached copy if any."""
+    # Changes of the grid are followed block by block, see changes.BlockTracker
+    return http_cache.fetch(grid_url(date, club), tracked=False)
+
+def get_page_html2(date: datetime.date, club: Club = URBAN) -> str:
     """Fetch the HTML of the match page."""
-    response = requests.get(urban_link_prefix + f"Grid.aspx?f={date.strftime('%d/%m/%Y')}&c=3")
-    response.raise_for_status()
-    return response.text
+    return get_page2(date, club).text
 
 def parse_match_element(el: str) -> Match:
     """Parse a single HTML block into a Match object."""
@@ -68,26 +145,30 @@ def parse_match_element(el: str) -> Match:
         match_type="Toto",
     )
 
+UNWANTED_CHARS_RE = re.compile(r'[^a-zA-Z0-9,\s\-\(\)]')
+SPACES_RE = re.compile(r'\s+')
+
 def clean_string(s: str) -> str:
     # Normalize accented characters (é -> e, ñ -> n, etc.)
     s = unicodedata.normalize('NFD', s)
     s = s.encode('ascii', 'ignore').decode('utf-8')
 
     # Remove all characters except letters, digits, commas, spaces, dash, and parentheses
-    s = re.sub(r'[^a-zA-Z0-9,\s\-\(\)]', '', s)
+    s = UNWANTED_CHARS_RE.sub('', s)
 
     # Collapse multiple spaces (optional)
-    s = re.sub(r'\s+', ' ', s)
+    s = SPACES_RE.sub(' ', s)
 
     return s.strip()
 
+# Improved regex pattern:
+# Optional level like "0,66-", captured as "level"
+# Name allows letters, accents, spaces, hyphens
+# Position is inside parentheses
+PLAYER_INFO_RE = re.compile(r'^(?:(?P<level>[\d,]+)-)?(?P<name>[^()]+?)(?:\s*\((?P<position>[^()]+)\))?$', re.UNICODE)
+
 def parse_player_info(player_str: str) -> dict:
-    # Improved regex pattern:
-    # Optional level like "0,66-", captured as "level"
-    # Name allows letters, accents, spaces, hyphens
-    # Position is inside parentheses
-    pattern = r'^(?:(?P<level>[\d,]+)-)?(?P<name>[^()]+?)(?:\s*\((?P<position>[^()]+)\))?$'
-    match = re.match(pattern, player_str.strip(), re.UNICODE)
+    match = PLAYER_INFO_RE.match(player_str.strip())
     
     if (not match) or (match.group("name").strip().lower() == "libre"):
         # print(player_str)
@@ -99,13 +180,63 @@ def parse_player_info(player_str: str) -> dict:
         "position": match.group("position")
     }
 
+@lru_cache(maxsize=8192)
+def parse_player_label(text: str) -> Optional[tuple[Optional[float], str, Optional[str]]]:
+    """
+        (level printed on the grid or None, name, position) of a player
+        label, None for a free spot. Memoized as the labels of the regulars
+        come back in many matches.
+    """
+    try:
+        info = parse_player_info(clean_string(text))
+    except ValueError as e:
+        if "libre" in str(e).lower():
+            return None
+        raise
+    level = parse_player_level(info["level"]) if info["level"] else None
+    return (level, sys.intern(info["name"].strip()), info["position"])
+
+class PlayerRegistry:
+    """
+        One ScrapePlayer per profile id, shared by all the matches of the
+        run instead of one per occurrence. The grid level and the position
+        are part of the key as they come from the label. Players are frozen,
+        their profile level lives in the player cache. Cleared with the
+        player cache expiry so the registry does not grow forever.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.players: dict[tuple, ScrapePlayer] = {}
+
+    def player(self, link: str, name: str, level: Optional[float], position: Optional[str]) -> ScrapePlayer:
+        key = (player_key(link), name, level, position)
+        p = self.players.get(key)
+        if p is None:
+            with self.lock:
+                p = self.players.setdefault(key, ScrapePlayer(name=name, grid_level=level, link=link,
+                                                              position=position))
+            count("players.registered")
+        return p
+
+    def clear(self):
+        with self.lock:
+            self.players = {}
+
+def new_player(link: str, name: str, level: Optional[float], position: Optional[str]) -> ScrapePlayer:
+    """Player not shared, for the parse workers: no lock nor counter, see ParsePool."""
+    return ScrapePlayer(name=name, grid_level=level, link=link, position=position)
+
+player_registry = PlayerRegistry()
+
+MATCH_LEVEL_RE = re.compile(r"Niveaux:\s*([\d,]+)\s*-\s*([\d,]+)")
+
 def parse_match_level(level_str: str) -> float:
     """
         Possible formats:
         * Niveaux: 0,10 - 2,02
         * Tous les niveaux
     """
-    match = re.search(r"Niveaux:\s*([\d,]+)\s*-\s*([\d,]+)", level_str)
+    match = MATCH_LEVEL_RE.search(level_str)
 
     if match:
         min_level_str, max_level_str = match.groups()
@@ -119,8 +250,7 @@ def parse_match_level(level_str: str) -> float:
         min_level = 0
         max_level = 0
     else:
-        print(level_str)
-        print("No levels found")
+        log.warning("No levels found in %r", level_str)
 
     return (min_level, max_level)
 
@@ -128,136 +258,140 @@ def parse_player_level(level_str: str) -> float:
     return float(level_str.replace(',', '.'))
 
 def fetch_player_level(url: str) -> float:
-    response = requests.get(url)
+    response = http_client.get(url)
     response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
-    level = soup.find("span", id=re.compile(r".*ctl00_WUCRegistroNivelJuego_LabelValorNivel$")).text.strip()
-    note = soup.find("span", id=re.compile(r".*_LabelValorPuntuacionRanking$"))
+    soup = make_soup(response.text)
+    level = soup.find("span", id=PROFILE_LEVEL_ID_RE).text.strip()
+    note = soup.find("span", id=PROFILE_NOTE_ID_RE)
     if note:
         note = note.text.strip()
     else:
         note = "0.0"
-    print(level)
-    print(note)
+    log.debug("Profile %s: level %s, note %s", url, level, note)
+
+def log_parse_stats():
+    parse = stats.spans.get("parse.grid", {"count": 0, "seconds": 0.0})
+    matches = stats.counters.get("parse.matches", 0)
+    per_match = parse["seconds"] / matches * 1000 if matches else 0.0
+    log.info("Parsed %d pages (%s): %d matches in %.3fs (%.2fms/match)",
+             parse["count"], HTML_PARSER, matches, parse["seconds"], per_match)
+
+# All the ids looked up in a match block, matched in a single walk over its tags
+MATCH_LINK_ID_RE = re.compile(r'_HyperLinkHorario$')
+MATCH_FIELD_ID_RE = re.compile(
+    r'(?:(?P<slot>Equipo[AB]_ctl0[01])_WUCParticipantePartidaCuadro_(?P<player_field>LabelTexto|HyperLinkJugador)'
+    r'|(?P<field>LabelDescripcionNiveles|ElementoPartidaCuadro_LabelEstado))$'
+)
+PLAYER_SLOTS = ("EquipoA_ctl00", "EquipoA_ctl01", "EquipoB_ctl00", "EquipoB_ctl01")
+
+def index_match_fields(player_match_el) -> dict[str, object]:
+    """
+        Walk the tags of the players div once and index the ones we need by
+        their id suffix, e.g. "LabelDescripcionNiveles" or
+        "EquipoA_ctl00_LabelTexto". First occurrence wins like find() would.
+    """
+    fields = {}
+    for tag in player_match_el.find_all(("span", "a"), id=True):
+        m = MATCH_FIELD_ID_RE.search(tag["id"])
+        if not m:
+            continue
+        if m.group("slot"):
+            key = f"{m.group('slot')}_{m.group('player_field')}"
+        else:
+            key = m.group("field")
+        fields.setdefault(key, tag)
+    return fields
 
-def parse_match_element2(el: str) -> UrbanMatch:
+def parse_match_element2(el: str, day: Optional[date] = None, club: Club = URBAN,
+                         make_player: Optional[Callable[..., Player]] = None) -> Match:
     """
-        Parse a single HTML block into a UrbanMatch object.
+        Parse a single HTML block into a UrbanMatch object, a ClubMatch for
+        the other clubs. Players come from make_player, the shared ones of
+        player_registry by default.
         First div is the URL link
         Then we need to parse players in the next sibling div
     """
     """ Don't parse hidden games"""
 
-    # Regex to identify the match link inside gridviewestilocabecera div
-    match_link_id_re = re.compile(r'_HyperLinkHorario$')
-    # Find the <a> inside this div with id matching pattern
-    a_tag = el.find("a", id=match_link_id_re)
+    # Find the <a> inside this gridviewestilocabecera div
+    a_tag = el.find("a", id=MATCH_LINK_ID_RE)
 
     if not a_tag:
         return None
 
     match_url = a_tag.get("href")
     match_text = a_tag.text.strip()
-    
-    # print(match_url)
-    # print(match_text)
 
     player_match_el = el.find_next_sibling("div")
+    fields = index_match_fields(player_match_el)
 
-    # day_pat_re = re.compile(r'.*LabelDiaSemana$')
-    # day = el.find("span", id=day_pat_re).text.strip()
-    # time_pat_re = re.compile(r'.*LabelHoraInicio$')
-    # start_time = el.find("span", id=time_pat_re).text.strip()
-    level_pat_re = re.compile(r'.*LabelDescripcionNiveles$')
-    level = player_match_el.find("span", id=level_pat_re).text.strip()
-    if level:
-        # print(player_match_el)
-        # print(level)
-        (min_level, max_level) = parse_match_level(level)
-        status_pat_re = re.compile(r'.*ElementoPartidaCuadro_LabelEstado$')
-        status = player_match_el.find("span", id=status_pat_re).text.strip()
-        # print(status)
-        # match_url_pat_re = re.compile(r'.*DataListPartidas_ctl03_WUCElementoPartidaCuadro_HyperLinkHorario$')
-        # match_url = player_match_el.find("a", id=match_url_pat_re)
-        # print(match_url)
-        court = match_text[:9].strip()
-        start_time = match_text[9:].strip()
-        players = []
-
-        for pat in ["EquipoA_ctl00", "EquipoA_ctl01", "EquipoB_ctl00", "EquipoB_ctl01"]:
-            player_pat_re = re.compile(f".*{pat}_WUCParticipantePartidaCuadro_LabelTexto$")
-            try:
-                match = player_match_el.find("span", id=player_pat_re)
-
-                if match:
-                    player = match.text.strip()
-                else:
-                    """
-                        It can be that on some matches, there are three players in the same team
-                        In this case there will 1 less player in the other team and the code below
-                        will be covered. In this case we discard the match
-                    """
-                    print(f"{pat} not found")
-                    return None
-
-                # print(f"{pat}: {player}")
-                # print(player)
-                player = clean_string(player)
-                # print(player)
-                player_info = parse_player_info(player)
-                link_player_pat_re = re.compile(f".*{pat}_WUCParticipantePartidaCuadro_HyperLinkJugador$")
-                link = player_match_el.find("a", id=link_player_pat_re)["href"]
-                if player_info["level"]:
-                    player_info["level"] = parse_player_level(player_info["level"])
-                else:
-                    # Fetch in direct link
-                    # https://urbanpadellausanne.matchpoint.com.es/Perfil.aspx?id=159e8bb24a5a9400ea274018c752379d&return_url=https%3a%2f%2furbanpadellausanne.matchpoint.com.es%2fMatches%2fGrid.aspx%3ff%3d21%2f05%2f2025%26c%3d3
-                    # url = urban_link_prefix + link
-                    # print(url)
-                    # fetch_player_level(url)
-                    pass
-                p = ScrapePlayer(
-                    name=player_info["name"].strip(), 
-                    level=player_info["level"], 
-                    link=link, 
-                    position=player_info["position"]
-                    )
-                p.upd_from_url()
-                players.append(p)
-            except ValueError as e:
-                if "libre" in str(e).lower():
-                    players.append(EmptyPlayer)
-                else:
-                    assert 0
-            # except Exception as e:
-            #     print(e)
-            #     print(player)
-            #     traceback.print_exc()
-            #     print(player_match_el)
-            #     print(pat)
-            #     assert 0
+    level_el = fields.get("LabelDescripcionNiveles")
+    level = level_el.text.strip() if level_el else ""
+    if not level:
+        return None
+
+    (min_level, max_level) = parse_match_level(level)
+    split = club.split_court(match_text)
+    if split is None:
+        log.warning("%s: unknown court in %r", club.name, match_text)
+        return None
+    (court, start_time) = split
+    players = []
+
+    for pat in PLAYER_SLOTS:
+        label = fields.get(f"{pat}_LabelTexto")
+        if not label:
+            """
+                It can be that on some matches, there are three players in the same team
+                In this case there will 1 less player in the other team and the code below
+                will be covered. In this case we discard the match
+            """
+            log.debug("%s not found", pat)
+            return None
+
+        player_info = parse_player_label(label.text.strip())
+        if player_info is None:
+            players.append(EmptyPlayer)
+            continue
+
+        link = urljoin(club.link_prefix, fields[f"{pat}_HyperLinkJugador"]["href"])
+        (level, name, position) = player_info
+        # Without a level on the grid it is on the profile page:
+        # https://urbanpadellausanne.matchpoint.com.es/Perfil.aspx?id=159e8bb24a5a9400ea274018c752379d&return_url=...
+        # The profile is only fetched later on if needed, see enrich_players
+        players.append((make_player or player_registry.player)(link, name, level, position))
 
+    match_date = datetime.strptime(f"{day or date.today()} {start_time}", "%Y-%m-%d %H:%M")
+    if club == URBAN:
         return UrbanMatch(
-            date=datetime.strptime(f"{date.today()} {start_time}", "%Y-%m-%d %H:%M"),
+            date=match_date,
             location="Lausanne",
             level=(min_level + max_level) / 2,
             a_team=tuple(players[:2]),
             b_team=tuple(players[-2:]),
-            court=court
+            court=court.label
         )
-    else:
-        return None
+    return ClubMatch(
+        date=match_date,
+        location=club.location,
+        level=(min_level + max_level) / 2,
+        a_team=tuple(players[:2]),
+        b_team=tuple(players[-2:]),
+        duration=court.duration,
+        court=f"{club.name}/{court.label}",
+        court_e=court.number
+    )
 
 def parse_match_players(match_url: str):
-    m_response = requests.get(urban_link_prefix + match_url)
-    m_soup = BeautifulSoup(m_response.text, "html.parser")
+    m_response = http_client.get(urban_link_prefix + match_url)
+    m_soup = make_soup(m_response.text)
 
 
 
 def get_matches() -> list[Match]:
     """Main function to return a list of Match objects."""
     html = get_page_html()
-    soup = BeautifulSoup(html, "html.parser")
+    soup = make_soup(html)
     match_elements = soup.find_all("div", class_="contenedorContenidoPartidas")
 
     matches = []
@@ -266,60 +400,236 @@ def get_matches() -> list[Match]:
             match = parse_match_element(el)
             matches.append(match)
         except Exception as e:
-            print(f"[Warning] Failed to parse a match block: {e}")
+            log.warning("Failed to parse a match block: %s", e)
             continue
 
     return matches
 
-def get_matches2() -> list[Match]:
-    """Main function to return a list of Match objects with a different URL."""
+def enrich_players(players: Iterable[Player], max_workers: int = MAX_FETCH_WORKERS):
+    """
+        Fetch the profile of the players whose level is unknown.
+        Each profile is fetched once even if the player shows up in
+        several matches, the fetches being run by a thread pool.
+    """
+    to_fetch: dict[str, ScrapePlayer] = {}
+    for p in players:
+        if isinstance(p, ScrapePlayer) and p.needs_profile():
+            to_fetch.setdefault(player_key(p.link), p)
 
-    today = date.today()
+    count("enrich.profiles", len(to_fetch))
+    if not to_fetch:
+        return
+
+    # The profiles land in the player cache, where every player of the
+    # same profile reads its level from
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # list() to propagate exceptions raised in the workers
+        list(executor.map(ScrapePlayer.upd_from_url, to_fetch.values()))
+
+def parse_grid_page(html: str, day: date, club: Club = URBAN) -> list[Match]:
+    """Parse all the matches of a Grid.aspx page."""
+    soup = make_soup(html)
+
+    # Find all divs with class "gridviewestilocabecera"
+    header_divs = soup.find_all("div", class_="gridviewestilocabecera")
+
+    matches = []
+    for header_div in header_divs:
+        match = parse_match_element2(header_div, day, club)
+        if match:
+            matches.append(match)
+
+    return matches
+
+def parse_block(html: str, day: date, club: Club = URBAN,
+                make_player: Optional[Callable[..., Player]] = None) -> Optional[Match]:
+    """Parse the raw HTML of a single match block, see changes.split_blocks."""
+    soup = make_soup(html)
+    header_div = soup.find("div", class_="gridviewestilocabecera")
+    if not header_div:
+        return None
+    return parse_match_element2(header_div, day, club, make_player)
+
+# Sent back by the parse workers instead of the match objects:
+# (class name, date, location, level, court, duration, court number,
+#  ((name, grid level, link, position) or None for a free spot, ...))
+# The profile level and note are in the player cache, not in the players
+MatchRecord = tuple
+
+def match_record(match: Optional[Match]) -> Optional[MatchRecord]:
+    if match is None:
+        return None
+    players = tuple(None if p.is_empty() else (p.name, p.grid_level, p.link, p.position)
+                    for p in match.a_team + match.b_team)
+    return (type(match).__name__, match.date, match.location, match.level, match.court,
+            match.duration, int(match.court_e), players)
+
+def match_from_record(record: Optional[MatchRecord]) -> Optional[Match]:
+    if record is None:
+        return None
+    (kind, match_date, location, level, court, duration, court_e, players) = record
+    players = [EmptyPlayer if p is None else player_registry.player(link=p[2], name=p[0], level=p[1], position=p[3])
+               for p in players]
+    if kind == UrbanMatch.__name__:
+        return UrbanMatch(date=match_date, location=location, level=level,
+                          a_team=tuple(players[:2]), b_team=tuple(players[-2:]), court=court)
+    return ClubMatch(date=match_date, location=location, level=level,
+                     a_team=tuple(players[:2]), b_team=tuple(players[-2:]),
+                     duration=duration, court=court, court_e=court_e)
+
+def parse_block_records(blocks: list[str], day: date, club: Club) -> list[Optional[MatchRecord]]:
+    """Run by the parse workers, see ParsePool. The players are shared once back in the parent."""
+    return [match_record(parse_block(block, day, club, new_player)) for block in blocks]
+
+class ParsePool:
+    """
+        Parse the new blocks of a page in worker processes, one chunk of
+        blocks per worker: the raw HTML goes out, match records come back
+        and the matches are rebuilt here. Batches under min_blocks are
+        parsed in process, shipping them would cost more than it saves.
+
+        Workers come from a forkserver, or are spawned where it is not
+        available, never forked from this process: its fetch, notifier and
+        API threads may hold a lock at that time, which would stay locked in
+        the child. The entry point modules must have a main guard.
+    """
+    def __init__(self, workers: int = PARSE_WORKERS, min_blocks: int = PARSE_POOL_MIN_BLOCKS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_blocks = min_blocks
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    # Imported once by the server instead of by every worker
+                    context.set_forkserver_preload(["scraper"])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self.executor
+
+    def parse_blocks(self, blocks: list[str], day: date, club: Club = URBAN) -> list[Optional[Match]]:
+        if self.workers <= 1 or len(blocks) < max(2, self.min_blocks):
+            count("parse.blocks.in_process", len(blocks))
+            return [parse_block(block, day, club) for block in blocks]
+
+        size = -(-len(blocks) // self.workers)
+        chunks = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+        with span("parse.pool"):
+            results = self.get_executor().map(parse_block_records, chunks, repeat(day), repeat(club))
+            matches = [match_from_record(r) for records in results for r in records]
+        count("parse.blocks.pool", len(blocks))
+        return matches
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+parse_pool = ParsePool()
+
+# Blocks of the last poll, only the blocks that changed are parsed again
+block_tracker = BlockTracker()
+
+def day_key(day: date, club: Club = URBAN) -> str:
+    """Key of the day page in the block tracker, the Urban one keeps the plain date."""
+    if club == URBAN:
+        return day.isoformat()
+    return f"{club.name}/{day.isoformat()}"
+
+def get_day_page_matches(day: date, club: Club = URBAN) -> tuple[http_cache.CachedPage, list[Match], bool]:
+    """
+        Fetch and parse the grid page of a single day, also returning the
+        page and whether one of its match blocks changed since the last poll.
+    """
+    log.debug("Fetching %s %s", club.name, day)
+
+    page = get_page2(day, club)
+
+    with span("parse.grid"):
+        parsed = block_tracker.parse_day(page.text, day, partial(parse_pool.parse_blocks, club=club), day_key(day, club))
+        if parsed is not None:
+            (matches, changed) = parsed
+        else:
+            matches = parse_grid_page(page.text, day, club)
+            changed = not page.unchanged
+    count("parse.matches", len(matches))
+    count(f"parse.{club.name}.matches", len(matches))
+
+    return (page, matches, changed)
 
+def get_day_matches(day: date, club: Club = URBAN) -> list[Match]:
+    """Fetch and parse the grid page of a single day."""
+    return get_day_page_matches(day, club)[1]
+
+def merge_clubs(day: date, clubs: list[Club], results: Iterable[Callable[[], list[Match]]]) -> list[Match]:
+    """
+        Matches of the day of every club, results returning them club by
+        club. A failing club is logged and skipped unless it is the only one.
+    """
     matches = []
+    for club, result in zip(clubs, results):
+        try:
+            matches.extend(result())
+        except Exception as e:
+            # One club being down must not hide the others
+            if len(clubs) == 1:
+                raise
+            log.warning("Failed to scrape %s on %s: %s", club.name, day, e)
+            count(f"scrape.{club.name}.failed")
+    return matches
 
-    for i in range(DAY_CHECKING_PERIOD):
-        day = today + timedelta(days=i)
-        print(day.isoformat())  # YYYY-MM-DD string
-
-        print(type(day))
-
-        html = get_page_html2(day)
-        soup = BeautifulSoup(html, "html.parser")
-        # print(soup)
-        # match_elements = soup.find_all("div", class_="contenedorContenidoPartidas")
-        # match_elements = soup.find_all("div", class_="contenedoresBannersPartidas")
-
-        # Find all divs with class "gridviewestilocabecera"
-        header_divs = soup.find_all("div", class_="gridviewestilocabecera")
-
-        for header_div in header_divs:
-            # print(header_div)
-            # try:
-            match = parse_match_element2(header_div)
-            if match:
-                match.date = match.date.replace(year=day.year, month=day.month, day=day.day)
-                matches.append(match)
-            # except Exception as e:
-            #     print(f"[Warning] Failed to parse a match block: {e}")
-            #     assert 0
-            #     continue
-
-            # Get the **next sibling div** that contains players info
-            # players_div = header_div.find_next_sibling("div")
-            # if players_div:
-            #     players_text = players_div.get_text(separator=" ", strip=True)
-            # else:
-            #     players_text = "No player info found"
+def iter_matches2(max_workers: int = MAX_FETCH_WORKERS, clubs: Optional[list[Club]] = None) -> Iterator[tuple[date, list[Match]]]:
+    """
+        Yield (day, matches) for every checked day, in date order, as soon as
+        the day and all the days before it are parsed, the matches of all the
+        clubs being merged. Day pages are fetched and parsed by up to
+        max_workers threads per club, each page being parsed as soon as it
+        arrives. All the clubs are scraped at once, http_client keeping every
+        host under its own concurrency cap and politeness delay, so a run
+        takes as long as the slowest club.
+    """
+    clubs = clubs or load_clubs()
+
+    today = date.today()
+    days = [today + timedelta(days=i) for i in range(DAY_CHECKING_PERIOD)]
 
+    try:
+        if max_workers <= 1:
+            for day in days:
+                yield (day, merge_clubs(day, clubs, (partial(get_day_matches, day, club) for club in clubs)))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers * len(clubs)) as executor:
+                # Day major so the near days of every club are fetched first
+                futures = [[executor.submit(get_day_matches, day, club) for club in clubs] for day in days]
+                for day, day_futures in zip(days, futures):
+                    yield (day, merge_clubs(day, clubs, (f.result for f in day_futures)))
+    finally:
+        parse_pool.close()
+    log_parse_stats()
+
+def get_matches2(max_workers: int = MAX_FETCH_WORKERS, clubs: Optional[list[Club]] = None) -> list[Match]:
+    """
+        Main function to return a list of Match objects with a different URL.
+        Matches are returned in date order whatever the completion order.
+    """
+    matches = []
+    for _, day_matches in iter_matches2(max_workers, clubs):
+        matches.extend(day_matches)
     return matches
 
 if __name__ == "__main__":
+    from instrument import setup_logging
+
+    # PADEL_LOG_LEVEL=DEBUG to see the matches
+    setup_logging()
     matches = get_matches2()
     for m in matches:
         if m.players_needed > 0:
             if m.min_level <= MY_LEVEL <= m.max_level:
-                print(m)
-                if m:
-                    print(m.a_team)
-                    print(m.b_team)
\ No newline at end of file
+                log.debug("%s", m)
+                log.debug("%s / %s", m.a_team, m.b_team)
\ No newline at end of file
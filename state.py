@@ -0,0 +1,48 @@
+# Helpers making the on disk state safe to share between processes, e.g.
+# one scraper per club or a manual run overlapping the cron one:
+# * files are written to a temporary file renamed over the old one, a
+#   reader never sees a partial file
+# * file_lock() serializes the read-merge-write of a file
+# The seen matches are in SQLite, see MatchCache.claim.
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Union
+
+# Not available on Windows, the pickled caches are then written without locking
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+def atomic_write(path: str, data: Union[bytes, str]):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    mode = "wb" if isinstance(data, bytes) else "w"
+    encoding = None if isinstance(data, bytes) else "utf-8"
+    try:
+        with open(tmp, mode, encoding=encoding) as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def atomic_dump(obj: Any, path: str):
+    atomic_write(path, pickle.dumps(obj))
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Exclusive lock on <path>.lock, held by one process at a time."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,157 @@
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import time
+from typing import Optional
+
+from config import *
+from models import Match, name_key
+from filter import (BaseMatchFilter, MatchOpenFilter, MatchFutureFilter, MatchPartnerLevelFilter,
+                    MatchTimeWindowFilter, apply_filters)
+from scraper import enrich_players
+from instrument import log, span, count
+
+@dataclass
+class Subscriber:
+    """
+        Criteria of one player, the single user setup of config.py being:
+        Subscriber(name="me", level=MY_LEVEL, durations=(90,), min_partner_level=MIN_PARTNER_LEVEL)
+        Empty durations/courts/time_windows mean "any". Subscribers carry no
+        delivery address: the notifier still sends everything to CHAT_ID.
+    """
+    name: str
+    level: float
+    durations: tuple[int, ...] = ()
+    courts: tuple[str, ...] = ()
+    min_partner_level: Optional[float] = None
+    excluded_partners: frozenset[str] = frozenset()
+    time_windows: tuple[tuple[time, time], ...] = ()
+
+    def residual_filters(self) -> list[BaseMatchFilter]:
+        """Criteria not answered by the index, checked per candidate match."""
+        filters = []
+        if self.time_windows:
+            filters.append(MatchTimeWindowFilter(list(self.time_windows)))
+        if self.min_partner_level is not None:
+            filters.append(MatchPartnerLevelFilter(level=self.min_partner_level))
+        return filters
+
+    @staticmethod
+    def from_dict(d: dict) -> "Subscriber":
+        return Subscriber(
+            name=d["name"],
+            level=float(d["level"]),
+            durations=tuple(d.get("durations", ())),
+            courts=tuple(d.get("courts", ())),
+            min_partner_level=d.get("min_partner_level"),
+            excluded_partners=frozenset(name_key(n) for n in d.get("excluded_partners", ())),
+            time_windows=tuple(
+                (time.fromisoformat(start), time.fromisoformat(end)) for (start, end) in d.get("time_windows", ())
+            ),
+        )
+
+def load_subscribers(path: str = SUBSCRIBERS_PATH) -> list[Subscriber]:
+    """
+        Read the subscribers JSON file, e.g.
+        [{"name": "alice", "level": 2.1, "durations": [90], "courts": ["Terrain 2"],
+          "min_partner_level": 1.5, "excluded_partners": ["Bob Smith"],
+          "time_windows": [["18:00", "21:00"]]}, ...]
+        Falls back to the single player of config.py.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [Subscriber.from_dict(d) for d in json.load(f)]
+    except FileNotFoundError:
+        return [Subscriber(name="me", level=MY_LEVEL, durations=(90,),
+                           min_partner_level=MIN_PARTNER_LEVEL)]
+
+class SubscriptionIndex:
+    """
+        Route every match to the subscribers whose criteria it meets without
+        evaluating every subscriber:
+        * subscribers are bucketed by (duration, court), None standing for "any"
+        * in a bucket they are sorted by level, so the ones whose level lies in
+          the match [min_level, max_level] range are a bisected slice
+          (same bounds as MatchMyLevelFilter)
+        * excluded partner names map to the set of subscribers excluding them
+          (same semantics as MatchPartnerNameFilter)
+        Only the remaining candidates run their residual filters.
+        Subscriber names must be unique, route() returns matches by name.
+        This is a library only, main.py and the watcher do not route through it.
+    """
+    def __init__(self, subscribers: list[Subscriber]):
+        names = [s.name for s in subscribers]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate subscriber names: {', '.join(duplicates)}")
+        self.subscribers = list(subscribers)
+        self.common_filters: list[BaseMatchFilter] = [MatchOpenFilter(), MatchFutureFilter()]
+        self.residual = [s.residual_filters() for s in self.subscribers]
+
+        buckets: dict[tuple, list[tuple[float, int]]] = {}
+        self.excluded: dict[str, set[int]] = {}
+        for i, s in enumerate(self.subscribers):
+            for duration in s.durations or (None,):
+                for court in s.courts or (None,):
+                    buckets.setdefault((duration, court), []).append((s.level, i))
+            for name in s.excluded_partners:
+                self.excluded.setdefault(name, set()).add(i)
+
+        # (duration, court) -> (sorted levels, subscriber ids in the same order)
+        self.buckets: dict[tuple, tuple[list[float], list[int]]] = {}
+        for key, entries in buckets.items():
+            entries.sort()
+            self.buckets[key] = ([level for level, _ in entries], [i for _, i in entries])
+
+    def candidates(self, match: Match) -> set[int]:
+        ids = set()
+        for key in ((match.duration, match.court), (match.duration, None), (None, match.court), (None, None)):
+            bucket = self.buckets.get(key)
+            if not bucket:
+                continue
+            levels, sub_ids = bucket
+            lo = bisect_left(levels, match.min_level)
+            hi = bisect_right(levels, match.max_level)
+            ids.update(sub_ids[lo:hi])
+
+        if ids and self.excluded:
+            for p in match.active_players():
+                excluded = self.excluded.get(name_key(p.name))
+                if excluded:
+                    ids -= excluded
+        return ids
+
+    def route(self, matches: list[Match]) -> dict[str, list[Match]]:
+        """Return {subscriber name: matches meeting all their criteria}."""
+        routed = {s.name: [] for s in self.subscribers}
+        matches = apply_filters(matches, self.common_filters)
+
+        with span("subscriptions.index"):
+            candidates = [(m, self.candidates(m)) for m in matches]
+            candidates = [(m, ids) for (m, ids) in candidates if ids]
+        count("subscriptions.candidates", sum(len(ids) for (_, ids) in candidates))
+
+        # Fetch the missing levels only for matches a profile filter will look at
+        need_profile = [m for (m, ids) in candidates if any(f.needs_profile for i in ids for f in self.residual[i])]
+        if need_profile:
+            with span("enrich"):
+                enrich_players(p for m in need_profile for p in m.active_players())
+
+        with span("subscriptions.residual"):
+            for (m, ids) in candidates:
+                for i in sorted(ids):
+                    if all(f(m) for f in self.residual[i]):
+                        routed[self.subscribers[i].name].append(m)
+        return routed
+
+if __name__ == "__main__":
+    from scraper import get_matches2
+    from instrument import setup_logging
+
+    setup_logging()
+    index = SubscriptionIndex(load_subscribers())
+    # Delivery per subscriber is not wired into the pipeline, this only reports the routing
+    for name, matches in index.route(get_matches2()).items():
+        log.info("%s: %d matches", name, len(matches))
+        for match in matches:
+            log.debug("%s: %s", name, match)
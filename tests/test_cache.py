@@ -0,0 +1,81 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from cache import MatchCache
+from models import EmptyPlayer, Match, Player
+
+@pytest.fixture
+def match() -> Match:
+    start = (datetime.now() + timedelta(days=1)).replace(hour=18, minute=0, second=0, microsecond=0)
+    player = Player(name="Alice Martin", grid_level=2.0, link="../Perfil.aspx?id=1", position=None)
+    return Match(start, "Lausanne", 2.0, (player, EmptyPlayer), (EmptyPlayer, EmptyPlayer), 90, "Terrain 1")
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "seen_matches.db")
+
+def test_concurrent_claim_has_one_winner(match, db_path):
+    # One connection each, as the processes sharing the database
+    caches = [MatchCache(db_path) for _ in range(8)]
+    barrier = threading.Barrier(len(caches))
+    results = []
+
+    def claim(cache: MatchCache):
+        barrier.wait()
+        results.append(cache.claim(match))
+
+    threads = [threading.Thread(target=claim, args=(cache,)) for cache in caches]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [False] * (len(caches) - 1) + [True]
+
+def test_claim_refused_once_notified(match, db_path):
+    first, second = MatchCache(db_path), MatchCache(db_path)
+    assert first.claim(match)
+    first.confirm(match)
+    assert second.has_seen(match)
+    assert not second.claim(match)
+    assert not first.claim(match)
+
+def test_released_claim_can_be_claimed_again(match, db_path):
+    first, second = MatchCache(db_path), MatchCache(db_path)
+    assert first.claim(match)
+    assert not second.claim(match)
+    first.release(match)
+    assert not second.has_seen(match)
+    assert second.claim(match)
+
+def test_release_keeps_notified_matches(match, db_path):
+    cache = MatchCache(db_path)
+    assert cache.claim(match)
+    cache.confirm(match)
+    cache.release(match)
+    assert cache.has_seen(match)
+
+def age_claim(cache: MatchCache, match: Match, age: timedelta):
+    # As left behind by a process that died age ago
+    cache.db.execute("UPDATE seen SET claimed_at = ? WHERE hash = ?",
+                     ((datetime.now() - age).isoformat(), cache.db_hash(match.stable_hash())))
+
+def test_stale_claim_is_taken_over(match, db_path):
+    timeout = timedelta(minutes=15)
+    dead, live = MatchCache(db_path, claim_timeout=timeout), MatchCache(db_path, claim_timeout=timeout)
+    assert dead.claim(match)
+    age_claim(dead, match, timeout - timedelta(minutes=1))
+    assert not live.claim(match)
+    age_claim(dead, match, timeout + timedelta(minutes=1))
+    assert live.claim(match)
+    # The claim is fresh again
+    assert not dead.claim(match)
+
+def test_notified_match_is_never_taken_over(match, db_path):
+    timeout = timedelta(minutes=15)
+    first, second = MatchCache(db_path, claim_timeout=timeout), MatchCache(db_path, claim_timeout=timeout)
+    assert first.claim(match)
+    first.confirm(match)
+    age_claim(first, match, timeout * 2)
+    assert not second.claim(match)
@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+import pytest
+
+from bench.synth import GridSynth, SynthConfig
+from changes import BlockTracker, split_blocks
+from scraper import parse_block, parse_grid_page
+
+FOOTER = '<div id="footer">Updated at {}</div>\n'
+
+@pytest.fixture
+def grid() -> str:
+    return GridSynth(SynthConfig(days=1, courts=2, first_hour=18, last_hour=21)).grid(0)
+
+def with_footer(html: str, stamp: str) -> str:
+    return html.replace("</form>", FOOTER.format(stamp) + "</form>")
+
+def parse_blocks(blocks: list[str], day: date) -> list:
+    return [parse_block(block, day) for block in blocks]
+
+def test_split_blocks_parse_as_the_whole_page(grid):
+    day = date.today() + timedelta(days=1)
+    blocks = split_blocks(grid)
+    expected = parse_grid_page(grid, day)
+    assert expected
+    assert len(blocks) == grid.count('class="gridviewestilocabecera"')
+    assert [m for m in parse_blocks(blocks, day) if m] == expected
+
+def test_last_block_stops_before_the_footer(grid):
+    blocks = split_blocks(with_footer(grid, "12:00:00"))
+    assert "footer" not in blocks[-1]
+    assert "</form>" not in blocks[-1]
+    assert blocks == split_blocks(with_footer(grid, "12:00:05"))
+
+def test_unclosed_last_block_runs_to_the_end(grid):
+    blocks = split_blocks(grid)
+    # Cut before the end of the players div of the last block
+    truncated = grid[:grid.rindex("</div>\n</div>\n</form>")]
+    assert split_blocks(truncated)[:-1] == blocks[:-1]
+    assert split_blocks(truncated)[-1] == truncated[truncated.rindex(blocks[-1][:80]):]
+
+def test_split_blocks_none_without_match():
+    assert split_blocks("<html><body>No match</body></html>") is None
+
+def test_footer_change_is_not_a_block_change(grid, tmp_path):
+    day = date.today() + timedelta(days=1)
+    tracker = BlockTracker(path=str(tmp_path / "blocks.pkl"))
+    parsed = []
+
+    def count_blocks(blocks: list[str], day: date) -> list:
+        parsed.append(len(blocks))
+        return parse_blocks(blocks, day)
+
+    (first, changed) = tracker.parse_day(with_footer(grid, "12:00:00"), day, count_blocks)
+    assert changed
+    (second, changed) = tracker.parse_day(with_footer(grid, "12:00:05"), day, count_blocks)
+    assert not changed
+    assert second == first == parse_grid_page(grid, day)
+    assert parsed == [len(split_blocks(grid))]
+
+def test_reset_forgets_the_pages(grid, tmp_path):
+    day = date.today() + timedelta(days=1)
+    tracker = BlockTracker(path=str(tmp_path / "blocks.pkl"))
+    days = tracker.days
+    tracker.parse_day(grid, day, parse_blocks)
+    tracker.reset()
+    assert tracker.days is days and not days
+    assert not tracker.fingerprints and not tracker.verdicts
+    assert tracker.parse_day(grid, day, parse_blocks)[1]
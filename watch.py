@@ -0,0 +1,138 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Optional
+
+from config import *
+from archive import MatchArchive
+from clubs import Club, URBAN, load_clubs
+from cache import MatchCache
+from filter import filters
+from pipeline import MatchPipeline, save_state
+from scraper import get_day_page_matches, parse_pool
+from instrument import log, setup_logging, write_summary
+
+if TYPE_CHECKING:
+    from api import MatchIndex
+
+@dataclass
+class DayPoller:
+    """
+        Polling state of the day at `offset` days from today in a club.
+        The interval shrinks when the grid changes and grows back
+        towards max_interval while it stays the same.
+    """
+    offset: int
+    interval: float
+    max_interval: float
+    next_poll: float = 0.0
+    polls: int = 0
+    changes: int = 0
+    club: Club = URBAN
+
+    def day(self) -> date:
+        return date.today() + timedelta(days=self.offset)
+
+    def is_due(self, now: float) -> bool:
+        return now >= self.next_poll
+
+    def update(self, changed: bool, now: float):
+        self.polls += 1
+        if changed:
+            self.changes += 1
+            self.interval = max(WATCH_MIN_INTERVAL, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        self.next_poll = now + self.interval
+
+def make_pollers(clubs: list[Club]) -> list[DayPoller]:
+    pollers = []
+    for offset in range(DAY_CHECKING_PERIOD):
+        if offset < WATCH_NEAR_DAYS:
+            interval = WATCH_NEAR_INTERVAL
+        else:
+            interval = WATCH_FAR_INTERVAL
+        for club in clubs:
+            pollers.append(DayPoller(offset=offset, interval=interval, max_interval=interval * 2, club=club))
+    return pollers
+
+class Watcher:
+    """
+        Resident version of main.py: caches and HTTP connections stay warm,
+        each day is polled at its own rate and the state is saved every
+        WATCH_SAVE_INTERVAL seconds and on exit. The polled matches also
+        refresh `index` when given, see api.py.
+    """
+    def __init__(self, index: Optional["MatchIndex"] = None):
+        self.cache = MatchCache()
+        self.archive = MatchArchive()
+        self.clubs = load_clubs()
+        self.pollers = make_pollers(self.clubs)
+        self.stop_event = threading.Event()
+        self.last_save = time.monotonic()
+        self.index = index
+
+    def stop(self, signum=None, frame=None):
+        log.info("Stopping watcher (signal %s)", signum)
+        self.stop_event.set()
+
+    def poll(self, pipeline: MatchPipeline, executor: ThreadPoolExecutor):
+        now = time.monotonic()
+        due = [p for p in self.pollers if p.is_due(now)]
+        if not due:
+            return
+
+        futures = [executor.submit(get_day_page_matches, p.day(), p.club) for p in due]
+        # Process in date order so near-term days are notified first
+        for poller, future in zip(due, futures):
+            try:
+                (_, matches, changed) = future.result()
+            except Exception as e:
+                log.warning("Failed to poll %s %s: %s", poller.club.name, poller.day(), e)
+                poller.update(changed=False, now=time.monotonic())
+                continue
+            # The first poll also processes pages left unchanged since the last run
+            if changed or poller.polls == 0:
+                pipeline.process(matches)
+                if self.index is not None:
+                    self.index.update(poller.club, poller.day(), matches)
+            poller.update(changed, time.monotonic())
+
+    def save(self):
+        save_state(self.cache, self.archive)
+        write_summary()
+        for p in self.pollers:
+            log.info("%s day +%d: every %.0fs, %d/%d polls changed", p.club.name, p.offset, p.interval, p.changes, p.polls)
+        self.last_save = time.monotonic()
+
+    def next_wakeup(self) -> float:
+        next_poll = min(p.next_poll for p in self.pollers)
+        next_save = self.last_save + WATCH_SAVE_INTERVAL
+        return max(0.0, min(next_poll, next_save) - time.monotonic())
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS * len(self.clubs)) as executor:
+
+            pipeline = MatchPipeline(self.cache, filters, self.archive)
+
+            try:
+                while not self.stop_event.is_set():
+                    self.poll(pipeline, executor)
+                    if time.monotonic() - self.last_save >= WATCH_SAVE_INTERVAL:
+                        self.save()
+                    self.stop_event.wait(self.next_wakeup())
+            finally:
+                pipeline.close()
+                parse_pool.close()
+
+        self.save()
+
+if __name__ == "__main__":
+    setup_logging()
+    Watcher().run()